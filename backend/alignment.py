@@ -0,0 +1,128 @@
+"""
+Alignment of a displayed text with what was read, on rapidfuzz's C Levenshtein.
+
+align() returns in one call the character edit distance of the two texts, that
+distance normalized by the longer text, and the word-level edit operations.
+match_keywords() finds the substituted words that are near misses ("play" read as
+"played", small transcription slips), so only true misses reach the miss handling.
+"""
+from collections import namedtuple
+from rapidfuzz import fuzz
+from rapidfuzz.distance import Levenshtein
+
+MATCH = "match"
+SUBSTITUTE = "substitute"
+INSERT = "insert"
+DELETE = "delete"
+
+# original_index is None for insertions and heard_index is None for deletions.
+WordOp = namedtuple("WordOp", ["op", "original_index", "heard_index"])
+Alignment = namedtuple("Alignment", ["distance", "normalized_distance", "word_ops"])
+KeywordMatch = namedtuple("KeywordMatch", ["original", "heard", "score", "original_index", "heard_index"])
+
+# Substituted words at least this similar (rapidfuzz fuzz.ratio, 0-100) count as read.
+# 90 accepts a dropped letter in words of 6+ letters ("jumped"/"jumpd", 90.9) but not
+# the misreadings of short words: "house"/"horse", "quiet"/"quite", "three"/"there"
+# (80) and "where"/"were" (88.9).
+KEYWORD_MATCH_THRESHOLD = 90
+# Endings that make a substituted word count as read whatever its score, when it is the
+# displayed word with one of them added or removed ("play"/"played", 80). "d" only
+# follows an "e" ("bake"/"baked"), so "ten"/"tend" stays a misreading.
+INFLECTION_SUFFIXES = ("s", "es", "ed", "ing")
+# Shorter words are never matched: "a"/"an" is a real misreading.
+KEYWORD_MATCH_MIN_LENGTH = 3
+
+
+def character_distance(original_text, transcribed_text):
+    """
+    Character-level Levenshtein distance, the same value as nltk's edit_distance.
+    """
+    return Levenshtein.distance(original_text, transcribed_text)
+
+
+def word_ops(original_words, heard_words):
+    """
+    Returns the per-word edit operations turning original_words into heard_words,
+    in order of both word lists.
+    """
+    ops = []
+    for tag, orig_start, orig_end, heard_start, heard_end in Levenshtein.opcodes(original_words, heard_words):
+        if tag == "equal":
+            ops.extend(
+                WordOp(MATCH, i, j)
+                for i, j in zip(range(orig_start, orig_end), range(heard_start, heard_end))
+            )
+            continue
+        paired = min(orig_end - orig_start, heard_end - heard_start) if tag == "replace" else 0
+        ops.extend(WordOp(SUBSTITUTE, orig_start + k, heard_start + k) for k in range(paired))
+        ops.extend(WordOp(DELETE, i, None) for i in range(orig_start + paired, orig_end))
+        ops.extend(WordOp(INSERT, None, j) for j in range(heard_start + paired, heard_end))
+    return ops
+
+
+def align(original_text, transcribed_text, original_words=None, heard_words=None):
+    """
+    Aligns a displayed text with its transcription.
+
+    Args:
+    - original_text (str), transcribed_text (str): The texts compared character by character.
+    - original_words (list), heard_words (list): The words aligned word by word; by
+      default the lowercased, whitespace-split texts.
+
+    Returns:
+    - Alignment: (distance, normalized_distance, word_ops)
+    """
+    if original_words is None:
+        original_words = original_text.lower().split()
+    if heard_words is None:
+        heard_words = transcribed_text.lower().split()
+    distance = character_distance(original_text, transcribed_text)
+    longest = max(len(original_text), len(transcribed_text))
+    return Alignment(
+        distance=distance,
+        normalized_distance=distance / longest if longest else 0.0,
+        word_ops=word_ops(original_words, heard_words),
+    )
+
+
+def is_inflection(word, other):
+    """
+    Whether one word is the other with an inflection ending added, see INFLECTION_SUFFIXES.
+    """
+    base, inflected = sorted((word, other), key=len)
+    if not inflected.startswith(base):
+        return False
+    suffix = inflected[len(base):]
+    return suffix in INFLECTION_SUFFIXES or (suffix == "d" and base.endswith("e"))
+
+
+def match_keywords(original_words, heard_words, ops=None, threshold=KEYWORD_MATCH_THRESHOLD,
+                   min_length=KEYWORD_MATCH_MIN_LENGTH):
+    """
+    Finds the substitutions of a word alignment that are near misses: the heard word is
+    an inflection of the displayed one or similar enough to count as read. Only words
+    the alignment put in the same place are compared, so a misread word is not excused
+    by a similar word elsewhere in the reading.
+
+    Args:
+    - original_words (list), heard_words (list): The aligned words of both texts.
+    - ops (list): Their word_ops, if the caller already aligned them.
+    - threshold (float): Minimum fuzz.ratio similarity of a match that is not an inflection.
+    - min_length (int): Words shorter than this are not matched.
+
+    Returns:
+    - list: KeywordMatch of each near miss, in text order.
+    """
+    if ops is None:
+        ops = word_ops(original_words, heard_words)
+    matches = []
+    for op in ops:
+        if op.op != SUBSTITUTE:
+            continue
+        original, heard = original_words[op.original_index], heard_words[op.heard_index]
+        if len(original) < min_length or len(heard) < min_length:
+            continue
+        score = fuzz.ratio(original, heard)
+        if score >= threshold or is_inflection(original, heard):
+            matches.append(KeywordMatch(original, heard, round(score, 1), op.original_index, op.heard_index))
+    return matches
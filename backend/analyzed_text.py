@@ -0,0 +1,113 @@
+import re
+from bisect import bisect_right
+from functools import cached_property
+from num2words import num2words
+
+_TOKEN = re.compile(r"\S+")
+
+
+def clean_and_convert_numbers(text: str) -> str:
+    # 1. Прибираємо спеціальні символи, залишаємо літери, цифри, пробіли
+    cleaned = re.sub(r'[^A-Za-z0-9\s]', '', text)
+    
+    # 2. Знаходимо числа в тексті
+    def replace_number(match):
+        num_str = match.group(0)
+        # Перетворюємо число в слова англійською
+        try:
+            num_word = num2words(int(num_str))
+            return num_word.replace('-', ' ')  # замінюємо дефіси на пробіли
+        except:
+            return num_str  # якщо не вдається конвертувати, повертаємо як є
+
+    # Заміна чисел на слова
+    converted = re.sub(r'\d+', replace_number, cleaned)
+
+    # 3. Прибираємо зайві пробіли
+    converted = re.sub(r'\s+', ' ', converted).strip()
+    
+    return converted
+
+
+def normalize_words(text: str) -> list:
+    return clean_and_convert_numbers(text).lower().split()
+
+
+class AnalyzedText:
+    """
+    A text tokenized once for all stages of the reading assessment. Each derived form
+    is computed on first use and then shared.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        matches = list(_TOKEN.finditer(text))
+        # Whitespace-separated tokens, the same as text.split(), with their character offsets.
+        self.tokens = [m.group() for m in matches]
+        self.offsets = [(m.start(), m.end()) for m in matches]
+        # For a transcript, the timed word each token was heard as, see from_timed_words.
+        self.timings = None
+
+    @classmethod
+    def from_timed_words(cls, timed_words):
+        """
+        The text of the timed words Whisper heard ({"word", "start", "end", "probability"},
+        as from transcript_words), keeping the timing of each token.
+        """
+        starts, position = [], 0
+        for timed in timed_words:
+            starts.append(position)
+            position += len(timed["word"]) + 1
+        analyzed = cls(" ".join(timed["word"] for timed in timed_words))
+        analyzed.timings = [timed_words[bisect_right(starts, start) - 1] for start, _ in analyzed.offsets]
+        return analyzed
+
+    @cached_property
+    def words(self):
+        """
+        Lowercased tokens, the words the complexity models score.
+        """
+        return [token.lower() for token in self.tokens]
+
+    @cached_property
+    def sentences(self):
+        """
+        Non-empty sentences, split on ". " as the readability metrics expect.
+        """
+        return [sentence for sentence in self.text.split(". ") if sentence]
+
+    @cached_property
+    def cleaned(self):
+        """
+        The text without special characters and with numbers written out in words.
+        """
+        return clean_and_convert_numbers(self.text)
+
+    @cached_property
+    def normalized_words(self):
+        """
+        Lowercased words of the cleaned text, the form texts are aligned in.
+        """
+        return self.cleaned.lower().split()
+
+    @cached_property
+    def token_words(self):
+        """
+        The normalized words of each token; their concatenation is normalized_words.
+        A number can expand to several words ("21" -> "twenty one").
+        """
+        return [normalize_words(token) for token in self.tokens]
+
+    @cached_property
+    def normalized_timed_words(self):
+        """
+        For a transcript made by from_timed_words: normalized_words, each with the
+        timing of the token it came from.
+        """
+        if self.timings is None:
+            return []
+        return [
+            dict(timed, word=word)
+            for timed, words in zip(self.timings, self.token_words)
+            for word in words
+        ]
@@ -0,0 +1,93 @@
+import base64
+import os
+import subprocess
+import numpy as np
+
+# Whisper expects 16 kHz mono audio.
+SAMPLE_RATE = 16000
+
+
+def _ffmpeg_command(input_url, sample_rate):
+    # Same output format as whisper.audio.load_audio, so the samples are identical.
+    return [
+        "ffmpeg",
+        "-nostdin",
+        "-threads", "0",
+        "-i", input_url,
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-",
+    ]
+
+
+def _run_ffmpeg(cmd, input_bytes=None, pass_fds=()):
+    try:
+        proc = subprocess.run(cmd, input=input_bytes, capture_output=True, pass_fds=pass_fds)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is required to decode audio but was not found on PATH.")
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {proc.stderr.decode(errors='ignore')}")
+    return proc.stdout
+
+
+def _decode_via_memfd(audio_bytes, sample_rate):
+    # m4a/mp4 recordings from phones keep their moov atom at the end, which
+    # ffmpeg can only reach on a seekable input. A memfd is seekable but lives
+    # in RAM only, so nothing is written to the filesystem.
+    fd = os.memfd_create("recording")
+    try:
+        view = memoryview(audio_bytes)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        cmd = _ffmpeg_command(f"/proc/self/fd/{fd}", sample_rate)
+        return _run_ffmpeg(cmd, pass_fds=(fd,))
+    finally:
+        os.close(fd)
+
+
+def _decode_via_pipe(audio_bytes, sample_rate):
+    cmd = _ffmpeg_command("pipe:0", sample_rate)
+    cmd.remove("-nostdin")
+    return _run_ffmpeg(cmd, input_bytes=audio_bytes)
+
+
+def pcm16_to_float32(pcm_bytes):
+    """
+    Converts raw little-endian 16-bit PCM to a float32 array normalized to [-1, 1].
+    """
+    return np.frombuffer(pcm_bytes, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def decode_audio_bytes(audio_bytes, sample_rate=SAMPLE_RATE):
+    """
+    Decodes an encoded recording (m4a, mp4, wav, mp3, ...) to a mono float32 array in memory.
+
+    Args:
+    - audio_bytes (bytes): The encoded audio file contents.
+    - sample_rate (int): The sample rate to resample to.
+
+    Returns:
+    - np.ndarray: 1-D float32 samples, ready to pass to Whisper.
+    """
+    if hasattr(os, "memfd_create"):
+        pcm = _decode_via_memfd(audio_bytes, sample_rate)
+    else:
+        pcm = _decode_via_pipe(audio_bytes, sample_rate)
+    return pcm16_to_float32(pcm)
+
+
+def decode_audio_file(path, sample_rate=SAMPLE_RATE):
+    """
+    Decodes an audio file on disk to a mono float32 array.
+    """
+    return pcm16_to_float32(_run_ffmpeg(_ffmpeg_command(path, sample_rate)))
+
+
+def decode_base64_audio(base64_audio, sample_rate=SAMPLE_RATE):
+    """
+    Decodes a base64-encoded recording, as sent by the app, to a mono float32 array.
+    """
+    return decode_audio_bytes(base64.b64decode(base64_audio), sample_rate)
@@ -0,0 +1,67 @@
+"""
+Compares the alignment module with the previous NLTK character distance plus separate
+word opcodes on long fragments of the .docx books, read back with word-level mistakes.
+Run from the backend directory:
+    python -m benchmarks.bench_alignment [--books ../frontend/assets/books] [--sentences 12]
+"""
+import argparse
+import random
+import time
+import Levenshtein as lev
+from nltk.metrics import distance
+from alignment import align
+from benchmarks.bench_readability import load_sentences
+
+
+def misread(text, rng):
+    words = text.split()
+    for _ in range(max(1, len(words) // 10)):
+        i = rng.randrange(len(words))
+        action = rng.choice(("drop", "swap", "repeat"))
+        if action == "drop":
+            del words[i]
+        elif action == "swap":
+            words[i] = words[i][::-1]
+        else:
+            words.insert(i, words[i])
+        if not words:
+            break
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", default="../frontend/assets/books")
+    parser.add_argument("--sentences", type=int, default=12, help="Sentences per fragment.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sentences = load_sentences(args.books)
+    fragments = [
+        " ".join(sentences[i:i + args.sentences])
+        for i in range(0, len(sentences), args.sentences)
+    ]
+    pairs = [(fragment, misread(fragment, rng)) for fragment in fragments]
+
+    start = time.perf_counter()
+    expected = []
+    for original, transcribed in pairs:
+        expected.append(distance.edit_distance(original, transcribed))
+        lev.opcodes(original.lower().split(), transcribed.lower().split())
+    nltk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    alignments = [align(original, transcribed) for original, transcribed in pairs]
+    align_seconds = time.perf_counter() - start
+
+    same = all(a.distance == e for a, e in zip(alignments, expected))
+    mean_chars = sum(len(original) for original, _ in pairs) / max(len(pairs), 1)
+    print(f"{len(pairs)} fragments, {mean_chars:.0f} characters on average, same distances: {same}")
+    print(f"{'path':<16} {'ms/fragment':>12}")
+    print(f"{'nltk + opcodes':<16} {nltk_seconds * 1000 / len(pairs):12.3f}")
+    print(f"{'alignment':<16} {align_seconds * 1000 / len(pairs):12.3f}")
+    print(f"speedup: {nltk_seconds / align_seconds:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
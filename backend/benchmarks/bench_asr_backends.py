@@ -0,0 +1,76 @@
+"""
+Compares the ASR backends in predictor.ASR_BACKENDS on a fixed local audio set,
+reporting word error rate (WER) and real-time factor (RTF, decode time / audio length).
+
+The audio set is described by a CSV manifest with "path" and "reference" columns;
+paths are relative to the manifest. Run from the backend directory:
+    python -m benchmarks.bench_asr_backends [--manifest audio/manifest.csv] [--model base]
+"""
+import argparse
+import csv
+import os
+import re
+import time
+import Levenshtein as lev
+from audio_decode import decode_audio_file, SAMPLE_RATE
+from predictor import ASR_BACKENDS
+from whisper_registry import DEFAULT_WHISPER_MODEL
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    reference_words = normalize_words(reference)
+    hypothesis_words = normalize_words(hypothesis)
+    return lev.distance(reference_words, hypothesis_words), len(reference_words)
+
+
+def load_manifest(path):
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (os.path.join(base_dir, row["path"]), row["reference"])
+            for row in csv.DictReader(f)
+        ]
+
+
+def evaluate(backend, samples):
+    errors = reference_words = 0
+    decode_seconds = audio_seconds = 0.0
+    for audio, reference in samples:
+        start = time.perf_counter()
+        result = backend.transcribe(audio)
+        decode_seconds += time.perf_counter() - start
+        audio_seconds += len(audio) / SAMPLE_RATE
+        e, n = word_error_rate(reference, result["text"])
+        errors += e
+        reference_words += n
+    return errors / max(reference_words, 1), decode_seconds / max(audio_seconds, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--manifest", default="audio/manifest.csv")
+    parser.add_argument("--model", default=DEFAULT_WHISPER_MODEL)
+    parser.add_argument("--backends", nargs="+", default=list(ASR_BACKENDS))
+    args = parser.parse_args()
+
+    samples = [(decode_audio_file(path), reference) for path, reference in load_manifest(args.manifest)]
+    total_seconds = sum(len(audio) for audio, _ in samples) / SAMPLE_RATE
+    print(f"{len(samples)} recordings, {total_seconds:.1f} s of audio, model {args.model}")
+    print(f"{'backend':<14} {'WER':>7} {'RTF':>7} {'load s':>7} {'weights MiB':>12}")
+    for name in args.backends:
+        backend = ASR_BACKENDS[name](args.model)
+        loaded = backend.shared_model()
+        backend.transcribe(samples[0][0])  # Warm up kernels before timing.
+        wer, rtf = evaluate(backend, samples)
+        print(
+            f"{name:<14} {wer:7.3f} {rtf:7.3f} {loaded.load_seconds:7.2f} "
+            f"{loaded.tensor_bytes / 2**20:12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares per-request decode latency of the old temp-file path in
+process_base64_audio with the in-memory path in audio_decode.
+
+Run from the backend directory:
+    python -m benchmarks.bench_audio_decode [--audio recording.m4a] [--runs 20]
+"""
+import argparse
+import base64
+import io
+import os
+import statistics
+import time
+import wave
+import numpy as np
+import whisper
+from pydub import AudioSegment
+from audio_decode import decode_base64_audio, SAMPLE_RATE
+
+
+def synthetic_wav_bytes(seconds=10, sample_rate=44100):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def legacy_decode(base64_audio, temp_filename="temp_audio.wav"):
+    # The previous process_base64_audio: write, re-read with pydub, export, let Whisper load it.
+    with open(temp_filename, "wb") as f:
+        f.write(base64.b64decode(base64_audio))
+    audio = AudioSegment.from_file(temp_filename)
+    audio.export(temp_filename, format="wav")
+    samples = whisper.load_audio(temp_filename, sr=SAMPLE_RATE)
+    os.remove(temp_filename)
+    return samples
+
+
+def time_runs(fn, arg, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"{name:<10} mean {statistics.mean(timings):8.2f} ms   "
+        f"p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--audio", help="Path to a recording; a 10 s synthetic WAV is used if omitted.")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio_bytes = f.read()
+    else:
+        audio_bytes = synthetic_wav_bytes()
+    base64_audio = base64.b64encode(audio_bytes).decode("utf-8")
+
+    old = legacy_decode(base64_audio)
+    new = decode_base64_audio(base64_audio)
+    print(f"Decoded {len(new) / SAMPLE_RATE:.1f} s of audio; max sample difference {np.abs(old - new).max():.6f}")
+
+    report("temp-file", time_runs(legacy_decode, base64_audio, args.runs))
+    report("in-memory", time_runs(decode_base64_audio, base64_audio, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Compares the shared WAL connection pool of db/connection.py with opening a new
+connection (default rollback journal) for every query, as db/help.py used to, and with
+one WAL connection per thread. Reader clients run the lookups of a
+/process-recorded-text call while writer clients record results and mistakes, on scratch
+copies of book.db and results.db. Each client runs every request on a new thread, as
+the Flask development server does, and, for comparison, on one long-lived thread.
+Run from the backend directory:
+    python -m benchmarks.bench_db_concurrency [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from db.connection import CACHED_STATEMENTS, SCHEMA_PRAGMAS, SQLITE_PRAGMAS, ConnectionPool
+
+BOOK_SCHEMA = (
+    "CREATE TABLE existing_words (id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT, meaning TEXT, syllables TEXT)",
+    "CREATE TABLE book_fragments (fragment_id INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER, text TEXT)",
+    "CREATE TABLE fragment_analysis (fragment_id INTEGER PRIMARY KEY, text_hash TEXT, analysis TEXT)",
+)
+RESULTS_SCHEMA = (
+    "CREATE TABLE text (text_index INTEGER PRIMARY KEY AUTOINCREMENT, student_index INTEGER, read_part TEXT, results_analysis TEXT)",
+    "CREATE TABLE mistakes (mistake_index INTEGER PRIMARY KEY AUTOINCREMENT, student_index INTEGER, word_index INTEGER, recognized_by_meaning INTEGER, pronounced_correctly INTEGER)",
+)
+N_WORDS = 5000
+N_FRAGMENTS = 500
+
+
+class ConnectPerCall:
+    """
+    The previous access pattern: connect, run one statement, commit, close.
+    """
+
+    def __init__(self, db_path, attach=None):
+        self.db_path = db_path
+        self.attach = dict(attach or {})
+
+    def _run(self, sql, params, fetch):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            for schema, path in self.attach.items():
+                conn.execute(f"ATTACH DATABASE '{path}' AS {schema}")
+            cur = conn.execute(sql, params)
+            rows = fetch(cur)
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def execute(self, sql, params=()):
+        self._run(sql, params, lambda cur: None)
+
+    def fetchone(self, sql, params=()):
+        return self._run(sql, params, lambda cur: cur.fetchone())
+
+    def fetchall(self, sql, params=()):
+        return self._run(sql, params, lambda cur: cur.fetchall())
+
+
+class ConnectionPerThread:
+    """
+    The previous pool: each thread opens its own WAL connection on its first query and
+    leaves closing it to garbage collection.
+    """
+
+    def __init__(self, db_path, attach=None):
+        self.db_path = db_path
+        self.attach = dict(attach or {})
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=CACHED_STATEMENTS)
+            for name, value in SQLITE_PRAGMAS:
+                conn.execute(f"PRAGMA {name} = {value}")
+            for schema, path in self.attach.items():
+                conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+                for name, value in SQLITE_PRAGMAS:
+                    if name in SCHEMA_PRAGMAS:
+                        conn.execute(f"PRAGMA {schema}.{name} = {value}")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        self._connection().execute(sql, params)
+
+    def fetchone(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+
+ACCESS = {
+    "connect per call": ConnectPerCall,
+    "per-thread WAL": ConnectionPerThread,
+    "shared pool": ConnectionPool,
+}
+
+
+def create_databases(directory):
+    book_path = os.path.join(directory, "book.db")
+    results_path = os.path.join(directory, "results.db")
+    rng = random.Random(0)
+    with sqlite3.connect(book_path) as conn:
+        for statement in BOOK_SCHEMA:
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO existing_words (word, meaning, syllables) VALUES (?, ?, ?)",
+            [(f"word{i}", "meaning " * 20, "wo-rd") for i in range(N_WORDS)],
+        )
+        conn.executemany(
+            "INSERT INTO book_fragments (book_id, text) VALUES (?, ?)",
+            [(1, "Once upon a time. " * 10) for _ in range(N_FRAGMENTS)],
+        )
+        conn.executemany(
+            "INSERT INTO fragment_analysis (fragment_id, text_hash, analysis) VALUES (?, ?, ?)",
+            [(i + 1, f"{rng.getrandbits(64):x}", "{}" * 500) for i in range(N_FRAGMENTS)],
+        )
+    with sqlite3.connect(results_path) as conn:
+        for statement in RESULTS_SCHEMA:
+            conn.execute(statement)
+    return book_path, results_path
+
+
+def read_request(book, results, rng):
+    # The lookups of one reading: fragment, its analysis, the result record, missed words
+    fragment_id = rng.randrange(1, N_FRAGMENTS + 1)
+    book.fetchone("SELECT * FROM book_fragments WHERE fragment_id = ?", (fragment_id,))
+    book.fetchone("SELECT * FROM fragment_analysis WHERE fragment_id = ?", (fragment_id,))
+    results.fetchone("SELECT text_index FROM text WHERE read_part = ?", (f"part {fragment_id}",))
+    for _ in range(4):
+        book.fetchone("SELECT rowid FROM existing_words WHERE word = ? LIMIT 1", (f"word{rng.randrange(N_WORDS)}",))
+    results.fetchall(
+        "SELECT m.word_index, b.word FROM mistakes m JOIN book.existing_words b ON m.word_index = b.id "
+        "WHERE m.word_index = ?",
+        (rng.randrange(N_WORDS),),
+    )
+
+
+def write_request(book, results, rng):
+    fragment_id = rng.randrange(1, N_FRAGMENTS + 1)
+    results.execute(
+        "INSERT INTO text (student_index, read_part, results_analysis) VALUES (?, ?, ?)",
+        (1, f"part {fragment_id}", "{}" * 200),
+    )
+    results.execute(
+        "INSERT INTO mistakes (student_index, word_index, recognized_by_meaning, pronounced_correctly) VALUES (?, ?, ?, ?)",
+        (1, rng.randrange(N_WORDS), 0, 0),
+    )
+
+
+def run(book, results, readers, writers, seconds, thread_per_request):
+    latencies = {"read": [], "write": []}
+    stop = time.perf_counter() + seconds
+    lock = threading.Lock()
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        request = read_request if kind == "read" else write_request
+        own = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            if thread_per_request:
+                thread = threading.Thread(target=request, args=(book, results, rng))
+                thread.start()
+                thread.join()
+            else:
+                request(book, results, rng)
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies[kind].extend(own)
+
+    threads = [threading.Thread(target=worker, args=("read", i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", readers + i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.readers} reader and {args.writers} writer clients, {args.seconds:g}s each")
+    for thread_per_request in (True, False):
+        print("one thread per request" if thread_per_request else "one long-lived thread per client")
+        print(f"{'access':<18} {'reads/s':>9} {'read p95 ms':>12} {'writes/s':>9} {'write p95 ms':>13}")
+        for name, access in ACCESS.items():
+            with tempfile.TemporaryDirectory() as directory:
+                book_path, results_path = create_databases(directory)
+                book = access(book_path)
+                results = access(results_path, attach={"book": book_path})
+                latencies = run(book, results, args.readers, args.writers, args.seconds, thread_per_request)
+            reads, writes = latencies["read"], latencies["write"]
+            print(
+                f"{name:<18} {len(reads) / args.seconds:9.0f} {percentile(reads, 0.95) * 1000:12.2f}"
+                f" {len(writes) / args.seconds:9.0f} {percentile(writes, 0.95) * 1000:13.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
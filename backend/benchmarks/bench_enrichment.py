@@ -0,0 +1,94 @@
+"""
+Compares how long recording the missed words of a reading keeps the request waiting
+when word information is generated inline (the previous fill_existing_words loop)
+and when the words are handed to the enrichment queue. Uses the stub provider with a
+simulated API latency and failure rate, on a scratch book.db.
+Run from the backend directory:
+    python -m benchmarks.bench_enrichment [--words 8] [--latency 0.5] [--failure-rate 0.2] [--workers 4]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import enrichment_queue
+from db.help import add_existing_word, get_existing_word_ids, save_existing_word_info
+from enrichment_queue import EnrichmentQueue, StubWordInfoProvider
+
+SCHEMA = (
+    "CREATE TABLE existing_words (id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT, meaning TEXT, antonyms TEXT, "
+    "synonyms TEXT, examples TEXT, transcription TEXT, syllables TEXT)",
+    "CREATE UNIQUE INDEX existing_words_word ON existing_words(word)",
+    "CREATE TABLE enrichment_jobs (word TEXT PRIMARY KEY, status TEXT, attempts INTEGER, available_at REAL, "
+    "created_at REAL, last_error TEXT)",
+    "CREATE TABLE word_info_cache (lemma TEXT, prompt_version TEXT, info TEXT, created_at REAL, "
+    "PRIMARY KEY (lemma, prompt_version))",
+    "CREATE TABLE word_info_versions (word TEXT PRIMARY KEY, prompt_version TEXT, stored_at REAL)",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=8, help="New missed words in the reading.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per provider call.")
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    # Keep the retries of failed calls within the benchmark's run time.
+    enrichment_queue.ENRICHMENT_BACKOFF_SECONDS = 0.1
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "db"))
+        with sqlite3.connect(os.path.join(directory, "db", "book.db")) as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        # The connection pools open db/book.db relative to the working directory.
+        os.chdir(directory)
+        try:
+            inline_words = [f"inline{i}" for i in range(args.words)]
+            provider = StubWordInfoProvider(latency_seconds=args.latency, failure_rate=args.failure_rate, seed=1)
+            start = time.perf_counter()
+            failures = 0
+            for word in inline_words:
+                add_existing_word(word)
+                while True:
+                    try:
+                        save_existing_word_info(word, provider.word_info(word))
+                        break
+                    except RuntimeError:
+                        failures += 1
+            inline_seconds = time.perf_counter() - start
+
+            queued_words = [f"queued{i}" for i in range(args.words)]
+            queue = EnrichmentQueue(
+                provider=StubWordInfoProvider(latency_seconds=args.latency, failure_rate=args.failure_rate, seed=1),
+                workers=args.workers,
+            )
+            start = time.perf_counter()
+            for word in queued_words:
+                add_existing_word(word)
+            queue.enqueue(queued_words)
+            request_seconds = time.perf_counter() - start
+            queue.wait_idle()
+            drained_seconds = time.perf_counter() - start
+            queue.stop()
+            ids = get_existing_word_ids(queued_words)
+            filled = sum(
+                1 for row in sqlite3.connect("db/book.db").execute(
+                    f"SELECT meaning FROM existing_words WHERE id IN ({', '.join('?' * len(ids))})", list(ids.values())
+                ) if row[0]
+            )
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.words} new words, {args.latency:g}s per call, failure rate {args.failure_rate:g}")
+    print(f"inline:  request waits {inline_seconds:.2f}s ({failures} failed calls retried in the request)")
+    print(
+        f"queued:  request waits {request_seconds * 1000:.1f} ms, {args.workers} workers filled "
+        f"{filled}/{args.words} words in {drained_seconds:.2f}s ({queue.retried} retries, {queue.failed} failed)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares resolving the missed words of a recording against existing_words the previous
+way (a COUNT(*) scan plus an unindexed lookup per word) with one indexed IN (...) query,
+on a scratch table of generated words.
+Run from the backend directory:
+    python -m benchmarks.bench_existing_words [--words 20000] [--missed 15] [--recordings 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from db.connection import ConnectionPool
+
+SCHEMA = "CREATE TABLE existing_words (id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT, syllables TEXT)"
+INDEX = "CREATE UNIQUE INDEX existing_words_word ON existing_words(word)"
+
+
+def lookup_per_word(conn, words):
+    ids = {}
+    for word in words:
+        if conn.execute("SELECT COUNT(*) FROM existing_words").fetchone()[0] == 0:
+            continue
+        row = conn.execute("SELECT rowid FROM existing_words WHERE word = ? LIMIT 1", (word,)).fetchone()
+        if row:
+            ids[word] = row[0]
+    return ids
+
+
+def lookup_bulk(pool, words):
+    rows = pool.fetchall(
+        f"SELECT word, id FROM existing_words WHERE word IN ({', '.join('?' * len(words))})", words
+    )
+    return {row[0]: row[1] for row in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=20000, help="Rows in existing_words.")
+    parser.add_argument("--missed", type=int, default=15, help="Missed words per recording.")
+    parser.add_argument("--recordings", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(args.words)]
+    recordings = [
+        [rng.choice(vocabulary) if rng.random() < 0.7 else f"new{rng.randrange(10 ** 6)}" for _ in range(args.missed)]
+        for _ in range(args.recordings)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "book.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute(SCHEMA)
+            conn.executemany(
+                "INSERT INTO existing_words (word, syllables) VALUES (?, ?)",
+                [(word, "wo-rd") for word in vocabulary],
+            )
+
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        expected = [lookup_per_word(conn, words) for words in recordings]
+        per_word_seconds = time.perf_counter() - start
+        conn.execute(INDEX)
+        conn.close()
+
+        pool = ConnectionPool(path)
+        start = time.perf_counter()
+        found = [lookup_bulk(pool, list(dict.fromkeys(words))) for words in recordings]
+        bulk_seconds = time.perf_counter() - start
+        pool.close()
+
+    print(f"{args.recordings} recordings of {args.missed} missed words, {args.words} known words, same ids: {found == expected}")
+    print(f"{'lookup':<20} {'ms/recording':>13}")
+    print(f"{'count + per word':<20} {per_word_seconds * 1000 / args.recordings:13.3f}")
+    print(f"{'indexed bulk':<20} {bulk_seconds * 1000 / args.recordings:13.3f}")
+    print(f"speedup: {per_word_seconds / bulk_seconds:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
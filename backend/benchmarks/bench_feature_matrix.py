@@ -0,0 +1,41 @@
+"""
+Compares building the training feature matrix word by word (get_feature_vector) with
+the batch path (get_feature_matrix), and checks that both give identical output.
+Run from the backend directory:
+    python -m benchmarks.bench_feature_matrix [--csv data/training_data.csv]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from preprocessor import WordPreprocessor
+from predictor import TRAINING_CSV_FILENAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default=TRAINING_CSV_FILENAME)
+    args = parser.parse_args()
+
+    words = pd.read_csv(args.csv)["word"]
+    preprocessor = WordPreprocessor()
+    preprocessor.get_feature_vector(words[0])  # Load the lemmatizer before timing.
+
+    start = time.perf_counter()
+    per_word = np.vstack([preprocessor.get_feature_vector(word) for word in words])
+    per_word_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = preprocessor.get_feature_matrix(words)
+    batch_seconds = time.perf_counter() - start
+
+    identical = per_word.dtype == batch.dtype and per_word.tobytes() == batch.tobytes()
+    print(f"{len(words)} words, shape {batch.shape}, bit-identical: {identical}")
+    print(f"{'path':<10} {'seconds':>9}")
+    print(f"{'per-word':<10} {per_word_seconds:9.3f}")
+    print(f"{'batch':<10} {batch_seconds:9.3f}")
+    print(f"speedup: {per_word_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares generating word information with one GPT call per word against the batched
+prompts of gpt_api.generate_word_info_batch, on words of the .docx books, against the
+local fake completion server (no network or API key needed).
+Run from the backend directory:
+    python -m benchmarks.bench_gpt_batch [--words 60] [--batch-size 20] [--latency 0.3] [--corrupt-rate 0.1]
+"""
+import argparse
+import re
+import time
+from db import gpt_api
+from benchmarks.bench_readability import load_sentences
+from benchmarks.fake_completion_server import start_fake_completion_server
+
+
+def book_words(books_dir, n):
+    words = []
+    for sentence in load_sentences(books_dir):
+        words += re.findall(r"[a-z]{4,}", sentence.lower())
+    return list(dict.fromkeys(words))[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", default="../frontend/assets/books")
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=gpt_api.WORD_INFO_BATCH_SIZE)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake server seconds per call.")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002)
+    parser.add_argument("--corrupt-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = start_fake_completion_server(
+        latency_seconds=args.latency,
+        seconds_per_token=args.seconds_per_token,
+        corrupt_rate=args.corrupt_rate,
+    )
+    gpt_api.OPENAI_API_KEY = "fake"
+    gpt_api.OPENAI_BASE_URL = server.base_url
+    words = book_words(args.books, args.words)
+
+    start = time.perf_counter()
+    for word in words:
+        gpt_api.generate_word_info(word)
+    single_seconds = time.perf_counter() - start
+    single = gpt_api.word_info_stats()
+
+    start = time.perf_counter()
+    infos, errors = gpt_api.generate_word_info_batch(words, batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - start
+    total = gpt_api.word_info_stats()
+    batch = {key: total[key] - single.get(key, 0) for key in total}
+    server.shutdown()
+
+    print(f"{len(words)} words, batches of {args.batch_size}, {args.corrupt_rate:.0%} of batched entries corrupted")
+    print(f"{'path':<10} {'calls':>6} {'prompt tok':>11} {'output tok':>11} {'seconds':>8}")
+    print(f"{'per word':<10} {single['calls']:6d} {single['prompt_tokens']:11d} {single['completion_tokens']:11d} {single_seconds:8.2f}")
+    print(f"{'batched':<10} {batch['calls']:6d} {batch['prompt_tokens']:11d} {batch['completion_tokens']:11d} {batch_seconds:8.2f}")
+    print(
+        f"batched: {len(infos)} words filled, {len(errors)} failed, {batch['fallback_words']} per-word fallbacks, "
+        f"{batch['calls_saved']} calls and ~{batch['estimated_prompt_tokens_saved']} prompt tokens saved"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compares keyword matching on the substitutions of the word alignment with the previous
+matching of every missed word against every new word (one rapidfuzz cdist call, score
+80), on long fragments of the .docx books read back with dropped words, inflection slips
+and one-letter misspellings. Reports how many exact-difference misses each keeps away
+from the miss handling, and checks minimal pairs that must and must not count as read.
+Run from the backend directory:
+    python -m benchmarks.bench_keyword_matching [--books ../frontend/assets/books] [--sentences 12]
+"""
+import argparse
+import random
+import time
+import numpy as np
+from rapidfuzz import fuzz, process
+from alignment import KEYWORD_MATCH_MIN_LENGTH, match_keywords, word_ops
+from benchmarks.bench_readability import load_sentences
+
+# (displayed, heard) pairs read in place of each other.
+NEAR_MISSES = [("play", "played"), ("jump", "jumps"), ("bake", "baked"), ("jumped", "jumpd"), ("garden", "gardn")]
+MISREADINGS = [("house", "horse"), ("quiet", "quite"), ("three", "there"), ("where", "were"), ("cat", "hat"), ("ten", "tend")]
+# Cutoff of the previous all-pairs matching.
+ALL_PAIRS_THRESHOLD = 80
+
+
+def misread(words, rng):
+    words = list(words)
+    for _ in range(max(1, len(words) // 8)):
+        i = rng.randrange(len(words))
+        action = rng.choice(("drop", "suffix", "typo"))
+        if action == "drop":
+            words[i] = ""
+        elif action == "suffix":
+            words[i] = words[i][:-2] if words[i].endswith("ed") else words[i] + "ed"
+        elif len(words[i]) > 4:
+            j = rng.randrange(1, len(words[i]) - 1)
+            words[i] = words[i][:j] + words[i][j + 1:]
+    return [w for w in words if w]
+
+
+def match_keywords_all_pairs(original, heard):
+    """
+    The previous matching: every missed word against every new word wherever they were
+    read, best scores first, each word matched at most once. Returns the matched pairs.
+    """
+    missed = [w for w in dict.fromkeys(original) if w not in set(heard) and len(w) >= KEYWORD_MATCH_MIN_LENGTH]
+    new = [w for w in dict.fromkeys(heard) if w not in set(original) and len(w) >= KEYWORD_MATCH_MIN_LENGTH]
+    if not missed or not new:
+        return set()
+    scores = process.cdist(missed, new, scorer=fuzz.ratio, score_cutoff=ALL_PAIRS_THRESHOLD, dtype=np.float32)
+    rows, columns = np.nonzero(scores >= ALL_PAIRS_THRESHOLD)
+    order = np.argsort(-scores[rows, columns], kind="stable")
+    matched, used_missed, used_new = set(), set(), set()
+    for i, j in zip(rows[order].tolist(), columns[order].tolist()):
+        if i not in used_missed and j not in used_new:
+            used_missed.add(i)
+            used_new.add(j)
+            matched.add((missed[i], new[j]))
+    return matched
+
+
+def minimal_pairs_read(matcher):
+    """
+    The minimal pairs that `matcher` counts as read, one pair per word position.
+    """
+    displayed, heard = (list(words) for words in zip(*NEAR_MISSES, *MISREADINGS))
+    return matcher(displayed, heard)
+
+
+def pairs_of(matches):
+    return {(match.original, match.heard) for match in matches}
+
+
+def aligned_pairs(original, heard):
+    return pairs_of(match_keywords(original, heard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", default="../frontend/assets/books")
+    parser.add_argument("--sentences", type=int, default=12, help="Sentences per fragment.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sentences = load_sentences(args.books)
+    fragments = [
+        " ".join(sentences[i:i + args.sentences]).lower().split()
+        for i in range(0, len(sentences), args.sentences)
+    ]
+    readings = []
+    for original in fragments:
+        heard = misread(original, rng)
+        readings.append((original, heard, word_ops(original, heard)))
+
+    start = time.perf_counter()
+    all_pairs = [match_keywords_all_pairs(original, heard) for original, heard, _ in readings]
+    all_pairs_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    aligned = [match_keywords(original, heard, ops) for original, heard, ops in readings]
+    aligned_seconds = time.perf_counter() - start
+
+    exact_misses = sum(len(set(original) - set(heard)) for original, heard, _ in readings)
+    print(f"{len(readings)} fragments, {exact_misses} exact-difference misses")
+    print(f"{'path':<10} {'ms/fragment':>12} {'read':>6}")
+    print(f"{'all pairs':<10} {all_pairs_seconds * 1000 / len(readings):12.3f} {sum(map(len, all_pairs)):6d}")
+    print(f"{'aligned':<10} {aligned_seconds * 1000 / len(readings):12.3f} {sum(len(pairs_of(matches)) for matches in aligned):6d}")
+
+    for name, matcher in (("all pairs", match_keywords_all_pairs), ("aligned", aligned_pairs)):
+        read = minimal_pairs_read(matcher)
+        print(
+            f"{name}: near misses read {len(read & set(NEAR_MISSES))}/{len(NEAR_MISSES)}, "
+            f"misreadings read {len(read & set(MISREADINGS))}/{len(MISREADINGS)}"
+        )
+    print(f"minimal pairs hold: {minimal_pairs_read(aligned_pairs) == set(NEAR_MISSES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Microbenchmark of per-word feature lookups against each lexicon backend, checking that
+every backend returns the same feature vectors as SQLite. Run from the backend directory:
+    python -m benchmarks.bench_lexicon [--csv data/training_data.csv] [--max-entries 20000]
+The mmap backend is included once `python lexicon.py build` has written its file; its
+MiB column is the file size, shared by all processes that map it.
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from lexicon import InMemoryLexicon, MappedLexicon, SQLiteLexicon, LEXICON_FILE_PATH
+from preprocessor import WordPreprocessor
+from predictor import TRAINING_CSV_FILENAME
+
+
+def time_lookups(preprocessor, words):
+    start = time.perf_counter()
+    features = np.vstack([preprocessor.get_feature_vector(word) for word in words])
+    return features, (time.perf_counter() - start) / len(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default=TRAINING_CSV_FILENAME)
+    parser.add_argument("--max-entries", type=int, default=20000,
+                        help="Cap for the capped in-memory variant.")
+    args = parser.parse_args()
+
+    words = list(pd.read_csv(args.csv)["word"])
+    backends = [
+        ("sqlite", SQLiteLexicon),
+        ("memory", InMemoryLexicon),
+        (f"memory<={args.max_entries}", lambda: InMemoryLexicon(max_entries=args.max_entries)),
+    ]
+    if os.path.exists(LEXICON_FILE_PATH):
+        backends.append(("mmap", MappedLexicon))
+
+    reference = None
+    print(f"{len(words)} words")
+    print(f"{'backend':<16} {'load s':>7} {'us/word':>9} {'MiB':>7} {'fallbacks':>10} {'identical':>10}")
+    for name, factory in backends:
+        start = time.perf_counter()
+        lexicon = factory()
+        load_seconds = time.perf_counter() - start
+        preprocessor = WordPreprocessor(lexicon=lexicon)
+        preprocessor.get_feature_vector(words[0])  # Load the lemmatizer before timing.
+        features, per_word = time_lookups(preprocessor, words)
+        if reference is None:
+            reference = features
+        stats = lexicon.stats()
+        print(
+            f"{name:<16} {load_seconds:7.2f} {per_word * 1e6:9.1f} "
+            f"{stats.get('memory_bytes', stats.get('file_bytes', 0)) / 2**20:7.1f} {stats.get('fallback_lookups', 0):10d} "
+            f"{str(features.tobytes() == reference.tobytes()):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
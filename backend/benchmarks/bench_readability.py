@@ -0,0 +1,61 @@
+"""
+Compares the one-pass readability engine with calling the six textstat functions per
+sentence, on the sentences of the .docx books, and checks that the values agree.
+Run from the backend directory:
+    python -m benchmarks.bench_readability [--books ../frontend/assets/books]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import textstat
+from docx import Document
+from readability import readability_metrics_many
+
+
+def textstat_metrics(text):
+    return {
+        "Automated Readability Index": textstat.automated_readability_index(text),
+        "Coleman–Liau Index": textstat.coleman_liau_index(text),
+        "Flesch-Kincaid Grade Level": textstat.flesch_kincaid_grade(text),
+        "Flesch Reading Ease": textstat.flesch_reading_ease(text),
+        "Gunning Fog Index": textstat.gunning_fog(text),
+        "SMOG Grade": textstat.smog_index(text),
+    }
+
+
+def load_sentences(books_dir):
+    sentences = []
+    for path in sorted(glob.glob(os.path.join(books_dir, "*.docx"))):
+        text = "\n".join(paragraph.text for paragraph in Document(path).paragraphs)
+        sentences += [s for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+    return sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", default=os.path.join("..", "frontend", "assets", "books"))
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.books)
+    start = time.perf_counter()
+    expected = [textstat_metrics(sentence) for sentence in sentences]
+    textstat_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = readability_metrics_many(sentences)
+    engine_seconds = time.perf_counter() - start
+
+    max_diff = max(
+        (abs(a[name] - e[name]) for a, e in zip(actual, expected) for name in e), default=0.0
+    )
+    print(f"{len(sentences)} sentences, max difference to textstat: {max_diff}")
+    print(f"{'path':<10} {'seconds':>9}")
+    print(f"{'textstat':<10} {textstat_seconds:9.3f}")
+    print(f"{'engine':<10} {engine_seconds:9.3f}")
+    print(f"speedup: {textstat_seconds / engine_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
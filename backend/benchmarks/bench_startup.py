@@ -0,0 +1,36 @@
+"""
+Measures how long constructing WordComplexityPredictor takes when the complexity models
+are retrained (the old behaviour on every server start) versus loaded from the model store.
+Run from the backend directory:
+    python -m benchmarks.bench_startup [--repeats 3]
+"""
+import argparse
+import statistics
+import time
+from predictor import WordComplexityPredictor
+
+
+def time_startup(retrain, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        WordComplexityPredictor(retrain=retrain)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    retrain = time_startup(True, args.repeats)
+    load = time_startup(False, args.repeats)
+    print(f"{'startup':<10} {'median s':>9}")
+    print(f"{'retrain':<10} {retrain:9.3f}")
+    print(f"{'load':<10} {load:9.3f}")
+    print(f"speedup: {retrain / load:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures transcription throughput with 1, 4 and 16 concurrent clients, with and
+without the micro-batching scheduler in front of the shared Whisper model.
+
+Run from the backend directory:
+    python -m benchmarks.bench_transcription_batching [--audio recording.m4a] [--requests 32]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from audio_decode import decode_audio_file, SAMPLE_RATE
+from transcription_scheduler import TranscriptionScheduler
+from whisper_registry import WHISPER_REGISTRY, DEFAULT_WHISPER_MODEL
+
+CLIENT_COUNTS = (1, 4, 16)
+
+
+def synthetic_audio(seconds=8):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def run(transcribe, audio, clients, requests):
+    latencies = []
+
+    def one_request(_):
+        start = time.perf_counter()
+        transcribe(audio)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--audio", help="Path to a recording; 8 s of synthetic audio is used if omitted.")
+    parser.add_argument("--model", default=DEFAULT_WHISPER_MODEL)
+    parser.add_argument("--int8", action="store_true", help="Use the int8-quantized CPU variant.")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--window-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    audio = decode_audio_file(args.audio) if args.audio else synthetic_audio()
+    loaded = WHISPER_REGISTRY.get(args.model, quantized=args.int8)
+    scheduler = TranscriptionScheduler(
+        loaded, max_batch_size=args.batch_size, window_ms=args.window_ms, queue_depth=args.requests
+    )
+    loaded.transcribe(audio)  # Warm up kernels before timing.
+
+    print(f"{'clients':>7} {'mode':>10} {'req/s':>8} {'mean latency':>13}")
+    for clients in CLIENT_COUNTS:
+        for mode, transcribe in (("direct", loaded.transcribe), ("batched", scheduler.transcribe)):
+            throughput, latency = run(transcribe, audio, clients, args.requests)
+            print(f"{clients:>7} {mode:>10} {throughput:8.2f} {latency:12.2f}s")
+    print(scheduler.stats())
+
+
+if __name__ == "__main__":
+    main()
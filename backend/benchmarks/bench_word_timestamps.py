@@ -0,0 +1,134 @@
+"""
+Compares the word-timestamp step of a decoded batch done per recording with whisper's
+add_word_timestamps (which re-encodes every recording) and done by the scheduler with
+one decoder pass over the batch's audio features, and checks that both give the same
+words and timings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_word_timestamps [--batch-sizes 1 4 8] [--repeats 3] [--random-weights]
+"""
+import argparse
+import threading
+import time
+import types
+import numpy as np
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE
+from whisper.model import ModelDimensions, Whisper
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+from transcription_scheduler import TranscriptionScheduler
+from whisper_registry import WHISPER_REGISTRY, DEFAULT_WHISPER_MODEL
+
+# Dimensions of the checkpoints in WHISPER_MODEL_SIZES, for --random-weights.
+MODEL_DIMS = {
+    "base": ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=512, n_audio_head=8, n_audio_layer=6,
+        n_vocab=51865, n_text_ctx=448, n_text_state=512, n_text_head=8, n_text_layer=6,
+    ),
+}
+SENTENCE = " The little fox jumped over the sleepy dog and ran into the green forest."
+
+
+def load_model(name, random_weights):
+    if random_weights:
+        model = Whisper(MODEL_DIMS[name]).eval()
+        return types.SimpleNamespace(model=model, lock=threading.Lock(), key=f"{name}-random")
+    return WHISPER_REGISTRY.get(name)
+
+
+def decoded_batch(loaded, size):
+    """
+    (pending, result) pairs as the scheduler has them after its batched decode.
+    """
+    model = loaded.model
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language="en", task="transcribe")
+    rng = np.random.default_rng(0)
+    audios = [(0.1 * rng.standard_normal(6 * SAMPLE_RATE)).astype(np.float32) for _ in range(size)]
+    mel = torch.stack(
+        [whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels) for audio in audios]
+    ).to(model.device)
+    with torch.no_grad():
+        features = model.embed_audio(mel)
+    tokens = tokenizer.encode(SENTENCE)
+    decoded = [
+        (
+            types.SimpleNamespace(audio=audio),
+            types.SimpleNamespace(
+                text=SENTENCE, tokens=tokens, language="en", audio_features=features[i],
+                avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.0,
+            ),
+        )
+        for i, audio in enumerate(audios)
+    ]
+    return decoded, mel, tokenizer
+
+
+def per_recording(loaded, decoded, mel, tokenizer):
+    """
+    Returns the timed words of each recording.
+    """
+    words = []
+    for i, (pending, result) in enumerate(decoded):
+        num_frames = min(len(pending.audio) // HOP_LENGTH, N_FRAMES)
+        segment = {"seek": 0, "start": 0.0, "end": num_frames * HOP_LENGTH / SAMPLE_RATE, "tokens": result.tokens}
+        with loaded.lock:
+            add_word_timestamps(
+                segments=[segment], model=loaded.model, tokenizer=tokenizer, mel=mel[i],
+                num_frames=num_frames, last_speech_timestamp=0.0,
+            )
+        words.append(segment["words"])
+    return words
+
+
+def same_timed_words(expected, actual):
+    """
+    Whether both paths give the same words and timings; probabilities may differ in
+    float rounding.
+    """
+    return len(expected) == len(actual) and all(
+        len(a) == len(b) and all(
+            (x["word"], x["start"], x["end"]) == (y["word"], y["start"], y["end"])
+            and abs(x["probability"] - y["probability"]) < 1e-4
+            for x, y in zip(a, b)
+        )
+        for a, b in zip(expected, actual)
+    )
+
+
+def best_of(repeats, function):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_WHISPER_MODEL)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--random-weights", action="store_true",
+        help="Time an untrained model of the same size; no checkpoint download needed.",
+    )
+    args = parser.parse_args()
+
+    loaded = load_model(args.model, args.random_weights)
+    scheduler = TranscriptionScheduler(loaded)
+    print(f"{'batch':>5} {'per recording':>14} {'batched':>9} {'speedup':>8} {'same words':>11}")
+    for size in args.batch_sizes:
+        decoded, mel, tokenizer = decoded_batch(loaded, size)
+        per_item = best_of(args.repeats, lambda: per_recording(loaded, decoded, mel, tokenizer))
+        batched = best_of(args.repeats, lambda: scheduler._with_word_timestamps(decoded))
+        expected = per_recording(loaded, decoded, mel, tokenizer)
+        actual = [result["segments"][0]["words"] for result in scheduler._with_word_timestamps(decoded)]
+        same = same_timed_words(expected, actual)
+        print(f"{size:5d} {per_item:13.3f}s {batched:8.3f}s {per_item / batched:7.1f}x {str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
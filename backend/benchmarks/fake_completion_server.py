@@ -0,0 +1,143 @@
+"""
+A local stand-in for the OpenAI chat completions endpoint that answers the word
+information prompts of db/gpt_api.py, so enrichment runs without network or an API key.
+Single-word prompts get one JSON object, batched prompts a JSON array; a fraction of
+the batched entries can be corrupted to exercise the per-word fallback. Token usage
+is approximated as one token per four characters.
+
+Run from the backend directory and point gpt_api.OPENAI_BASE_URL at the printed URL:
+    python -m benchmarks.fake_completion_server [--port 8089] [--latency 0.3] [--corrupt-rate 0.1]
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BATCH_WORDS = re.compile(r"Words: (\[.*?\])")
+_SINGLE_WORD = re.compile(r"For the English word '(.+?)'")
+
+
+def approx_tokens(text):
+    return math.ceil(len(text) / 4)
+
+
+def fake_word_info(word):
+    return {
+        "meaning": f"The meaning of '{word}'.",
+        "antonyms": "",
+        "synonyms": f"{word}-like",
+        "examples": [f"I read the word {word}.", f"{word.capitalize()} is a word.", f"Say {word} again."],
+        "transcription": f"/{word}/",
+        "syllables": word,
+    }
+
+
+class FakeCompletionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_seconds=0.0, seconds_per_token=0.0, corrupt_rate=0.0, seed=0):
+        super().__init__(address, _Handler)
+        self.latency_seconds = latency_seconds
+        self.seconds_per_token = seconds_per_token
+        self.corrupt_rate = corrupt_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+        batch = _BATCH_WORDS.search(prompt)
+        if batch:
+            entries = []
+            for word in json.loads(batch.group(1)):
+                with self._lock:
+                    corrupt = self._random.random() < self.corrupt_rate
+                if corrupt:
+                    # Entries a real model gets wrong: missing fields or left out entirely
+                    if len(word) % 2:
+                        entries.append({"word": word, "meaning": ""})
+                    continue
+                entries.append({"word": word, **fake_word_info(word)})
+            return json.dumps(entries)
+        single = _SINGLE_WORD.search(prompt)
+        if single:
+            return json.dumps(fake_word_info(single.group(1)))
+        return "I can only answer word information prompts."
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = request["messages"][-1]["content"]
+        content = self.server.answer(prompt)
+        completion_tokens = approx_tokens(content)
+        time.sleep(self.server.latency_seconds + self.server.seconds_per_token * completion_tokens)
+        body = json.dumps({
+            "id": f"chatcmpl-fake-{self.server.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": approx_tokens(prompt),
+                "completion_tokens": completion_tokens,
+                "total_tokens": approx_tokens(prompt) + completion_tokens,
+            },
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_completion_server(port=0, **options):
+    """
+    Serves a FakeCompletionServer from a daemon thread and returns it; its base_url is
+    what gpt_api.OPENAI_BASE_URL should be set to.
+    """
+    server = FakeCompletionServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-completions", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds added to every call.")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002)
+    parser.add_argument("--corrupt-rate", type=float, default=0.1, help="Share of batched entries to corrupt.")
+    args = parser.parse_args()
+
+    server = FakeCompletionServer(
+        ("127.0.0.1", args.port),
+        latency_seconds=args.latency,
+        seconds_per_token=args.seconds_per_token,
+        corrupt_rate=args.corrupt_rate,
+    )
+    print(f"Fake completions at {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
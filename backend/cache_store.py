@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded in-memory cache that evicts the least recently used entry.
+    With ttl_seconds set, entries also expire that long after they were stored.
+    """
+
+    def __init__(self, max_entries, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, expires_at = self._entries[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheTier:
+    """
+    A persistent key/value table for cache entries that should survive restarts.
+    Values are stored as JSON. With ttl_seconds set, older entries are ignored.
+    """
+
+    def __init__(self, db_path, table, ttl_seconds=None):
+        self.db_path = db_path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+        )
+        conn.commit()
+        conn.close()
+
+    def _oldest_valid(self):
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else 0
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Returns {key: value} for the keys that are stored and not expired.
+        """
+        keys = list(keys)
+        values = {}
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        # Stay well below SQLite's limit on bound parameters.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cur.execute(
+                f"SELECT key, value FROM {self.table} WHERE created_at >= ? "
+                f"AND key IN ({','.join('?' * len(chunk))})",
+                (self._oldest_valid(), *chunk),
+            )
+            values.update((key, json.loads(value)) for key, value in cur.fetchall())
+        conn.close()
+        return values
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, items):
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+            [(key, json.dumps(value), now) for key, value in items.items()],
+        )
+        conn.commit()
+        conn.close()
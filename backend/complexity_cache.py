@@ -0,0 +1,78 @@
+from cache_store import LRUCache, SQLiteCacheTier
+
+COMPLEXITY_CACHE_SIZE = 50000
+COMPLEXITY_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Set to a path such as "db/complexities.db" to keep scores across restarts.
+COMPLEXITY_CACHE_DB_PATH = None
+
+
+def complexity_cache_key(word, model_name, model_version):
+    """
+    Keys a score by the model artifact too, so retrained models never see scores
+    from the previous artifact.
+    """
+    return f"{model_version}:{model_name}:{word.lower()}"
+
+
+class ComplexityCache:
+    """
+    Memoizes word complexity scores in a bounded LRU with a TTL, optionally backed by
+    a persistent SQLite tier.
+    """
+
+    def __init__(
+        self,
+        max_entries=COMPLEXITY_CACHE_SIZE,
+        ttl_seconds=COMPLEXITY_CACHE_TTL_SECONDS,
+        db_path=COMPLEXITY_CACHE_DB_PATH,
+    ):
+        self._memory = LRUCache(max_entries, ttl_seconds)
+        self._disk = SQLiteCacheTier(db_path, "complexity_cache", ttl_seconds) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """
+        Returns {key: score} for the keys that are cached.
+        """
+        found = {}
+        for key in keys:
+            score = self._memory.get(key)
+            if score is not None:
+                found[key] = score
+        self.hits += len(found)
+        missing = [key for key in keys if key not in found]
+        if self._disk is not None and missing:
+            from_disk = self._disk.get_many(missing)
+            for key, score in from_disk.items():
+                self._memory.put(key, score)
+            found.update(from_disk)
+            self.disk_hits += len(from_disk)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores):
+        for key, score in scores.items():
+            self._memory.put(key, score)
+        if self._disk is not None and scores:
+            self._disk.put_many(scores)
+
+    def clear(self):
+        self._memory.clear()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self._memory.max_entries,
+            "ttl_seconds": self._memory.ttl_seconds,
+            "persistent": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+        }
+
+
+COMPLEXITY_CACHE = ComplexityCache()
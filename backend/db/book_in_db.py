@@ -3,7 +3,7 @@ import os
 import sqlite3
 from docx import Document
 import sqlite3
-from create_databases import get_books_count
+from db.create_databases import get_books_count
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BOOKS_DIR = os.path.join(BASE_DIR, '..', '..', 'frontend', 'assets', 'books')
@@ -48,14 +48,25 @@ def insert_fragments_to_db(fragments, book_name=None):
     else:
         raise ValueError(f"Book '{book_name}' not found in books table.")
 
+    inserted = []
     for frag in fragments:
         cur.execute(
             "INSERT INTO book_fragments (book_id, chapter_name, text) VALUES (?, ?, ?)",
               (book_id, None, frag)
         )
+        inserted.append({"fragment_id": cur.lastrowid, "text": frag})
     conn.commit()
     conn.close()
     print(f"Inserted {len(fragments)} fragments into book_fragments table.")
+    return inserted
+
+def analyse_fragments(fragments):
+    """
+    Precomputes and stores the text analysis of newly inserted fragments.
+    """
+    from precompute_fragments import precompute_fragment_analyses
+    analysed = precompute_fragment_analyses(fragments)
+    print(f"Analysed {analysed} fragments.")
 
 def delete_book_fragments(book_name):
     """
@@ -67,6 +78,11 @@ def delete_book_fragments(book_name):
     result = cur.fetchone()
     if result:
         book_id = result[0]
+        cur.execute(
+            "DELETE FROM fragment_analysis WHERE fragment_id IN "
+            "(SELECT fragment_id FROM book_fragments WHERE book_id = ?)",
+            (book_id,)
+        )
         cur.execute("DELETE FROM book_fragments WHERE book_id = ?", (book_id,))
         conn.commit()
         print(f"Deleted all fragments for book '{book_name}'")
@@ -108,12 +124,12 @@ def add_fragments_to_db():
             rewrite = input(f"Book '{book_name}' already exists. Do you want to rewrite it? (yes/no): ").strip().lower()
             if rewrite in ("yes", "y"):
                 delete_book_fragments(book_name)
-                insert_fragments_to_db(fragments, book_name=book_name)
+                analyse_fragments(insert_fragments_to_db(fragments, book_name=book_name))
                 print(f"Book '{book_name}' has been rewritten.")
             else:
                 print(f"Book '{book_name}' was not rewritten.")
         else:
-            insert_fragments_to_db(fragments, book_name=book_name)
+            analyse_fragments(insert_fragments_to_db(fragments, book_name=book_name))
         
         # Ask if user wants to add another book
         another = input("Do you want to add another book? (yes/no): ").strip().lower()
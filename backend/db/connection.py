@@ -0,0 +1,207 @@
+"""
+Pooled SQLite access for book.db and results.db.
+
+Each database has a bounded set of open connections shared by all threads instead of
+connecting for every query. Every call or transaction checks one out and returns it,
+so the Flask server, which runs each request on a new thread, reuses them across
+requests. Connections run in WAL mode, so readers no longer wait for a writer, and
+keep sqlite3's per-connection cache of prepared statements warm across calls. The
+results connections have book.db attached as `book` for the joins over both databases.
+
+Connections are in autocommit mode: single statements commit on their own, and
+multi-statement writes go through `with pool.transaction() as conn:`.
+
+Tables added after the first release are listed in BOOK_SCHEMA and created when the
+pool opens its first connection, so an existing book.db picks them up without
+re-running db/create_databases.py.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BOOK_DB_PATH = "db/book.db"
+RESULT_DB_PATH = "db/results.db"
+
+# Applied to every new connection. WAL lets reads proceed during a write, and with WAL
+# synchronous=NORMAL only gives up durability of the last commits on power loss.
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -16000),  # KiB
+)
+# The pragmas above that are set per database, so also on attached ones.
+SCHEMA_PRAGMAS = ("journal_mode", "synchronous", "cache_size")
+# Prepared statements each connection keeps, see sqlite3.connect(cached_statements=).
+CACHED_STATEMENTS = 256
+# Open connections per database; further callers wait for one to be returned.
+POOL_SIZE = 8
+
+BOOK_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS reference_pronunciations (
+        word TEXT PRIMARY KEY,
+        audio_base64 TEXT,
+        transcription TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fragment_analysis (
+        fragment_id INTEGER PRIMARY KEY,
+        text_hash TEXT,
+        analysis_version INTEGER,
+        model_name TEXT,
+        model_version TEXT,
+        analysis TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS fragment_analysis_text_hash ON fragment_analysis(text_hash)",
+    """
+    CREATE TABLE IF NOT EXISTS enrichment_jobs (
+        word TEXT PRIMARY KEY,
+        status TEXT,
+        attempts INTEGER,
+        available_at REAL,
+        created_at REAL,
+        last_error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS enrichment_jobs_due ON enrichment_jobs(status, available_at)",
+    """
+    CREATE TABLE IF NOT EXISTS word_info_cache (
+        lemma TEXT,
+        prompt_version TEXT,
+        info TEXT,
+        created_at REAL,
+        PRIMARY KEY (lemma, prompt_version)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS word_info_versions (
+        word TEXT PRIMARY KEY,
+        prompt_version TEXT,
+        stored_at REAL
+    )
+    """,
+)
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to the database at db_path, shared by all threads, with
+    the databases in attach ({schema name: path}) attached once when a connection is
+    opened. The `schema` statements (CREATE ... IF NOT EXISTS) run once, on the first
+    connection.
+    """
+
+    def __init__(self, db_path, attach=None, pragmas=SQLITE_PRAGMAS, schema=(), size=POOL_SIZE):
+        self.db_path = db_path
+        self.attach = dict(attach or {})
+        self.pragmas = pragmas
+        self.schema = schema
+        self.size = size
+        self._schema_created = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.checkouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        for schema, path in self.attach.items():
+            conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+            for name, value in self.pragmas:
+                if name in SCHEMA_PRAGMAS:
+                    conn.execute(f"PRAGMA {schema}.{name} = {value}")
+        with self._lock:
+            self.connections_opened += 1
+            if not self._schema_created:
+                for statement in self.schema:
+                    conn.execute(statement)
+                self._schema_created = True
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the block, opening one if none is idle and the pool
+        is not full, and waiting for one otherwise.
+        """
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            with self._lock:
+                self.checkouts += 1
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def execute(self, sql, params=()):
+        """
+        Runs one statement and returns its cursor for rowcount and lastrowid; read rows
+        with fetchone or fetchall, which fetch them before the connection is returned.
+        """
+        with self.connection() as conn:
+            return conn.execute(sql, params)
+
+    def fetchone(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block in one write transaction on a checked-out connection, committed
+        on success and rolled back on error.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        """
+        Closes the idle connections; later calls open new ones.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            "db_path": self.db_path,
+            "attached": dict(self.attach),
+            "size": self.size,
+            "connections_opened": self.connections_opened,
+            "idle_connections": self._idle.qsize(),
+            "checkouts": self.checkouts,
+        }
+
+
+BOOK_DB = ConnectionPool(BOOK_DB_PATH, schema=BOOK_SCHEMA)
+RESULTS_DB = ConnectionPool(RESULT_DB_PATH, attach={"book": BOOK_DB_PATH})
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from db.connection import BOOK_SCHEMA
 
 db_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -37,6 +38,10 @@ CREATE TABLE IF NOT EXISTS books (
 )
 """)
 
+# Tables the server also creates on startup, see db/connection.py
+for statement in BOOK_SCHEMA:
+    cur_book.execute(statement)
+
 conn_book.commit()
 conn_book.close()
 
@@ -67,6 +72,42 @@ CREATE TABLE IF NOT EXISTS mistakes (
 conn_results.commit()
 conn_results.close()
 
+def migrate_existing_words_unique():
+    """
+    Makes existing_words.word unique. Duplicate words keep their lowest id, and mistakes
+    pointing at a removed duplicate are moved to that id. Does nothing once the index exists.
+    """
+    conn = sqlite3.connect(results_db_path)
+    conn.execute("ATTACH DATABASE ? AS book", (book_db_path,))
+    exists = conn.execute(
+        "SELECT 1 FROM book.sqlite_master WHERE type = 'index' AND name = 'existing_words_word'"
+    ).fetchone()
+    if exists:
+        conn.close()
+        return 0
+    with conn:
+        conn.execute("""
+        CREATE TEMP TABLE duplicate_words AS
+        SELECT w.id AS id, k.keep_id AS keep_id
+        FROM book.existing_words w
+        JOIN (SELECT word, MIN(id) AS keep_id FROM book.existing_words GROUP BY word) k ON w.word = k.word
+        WHERE w.id != k.keep_id
+        """)
+        conn.execute("""
+        UPDATE mistakes SET word_index = (SELECT keep_id FROM duplicate_words WHERE id = mistakes.word_index)
+        WHERE word_index IN (SELECT id FROM duplicate_words)
+        """)
+        removed = conn.execute(
+            "DELETE FROM book.existing_words WHERE id IN (SELECT id FROM duplicate_words)"
+        ).rowcount
+        conn.execute("CREATE UNIQUE INDEX book.existing_words_word ON existing_words(word)")
+    conn.close()
+    if removed:
+        print(f"Removed {removed} duplicate rows from existing_words.")
+    return removed
+
+migrate_existing_words_unique()
+
 def get_books_count():
     """
     Returns the amount of recordings (rows) in the books table of book.db
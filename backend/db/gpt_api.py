@@ -1,30 +1,78 @@
+import json
+import re
+import threading
 import openai
 
 # Set your OpenAI API key here or use environment variable
 OPENAI_API_KEY = ""
+# Another OpenAI-compatible endpoint, e.g. the local fake server of
+# benchmarks/fake_completion_server.py. None uses the OpenAI API.
+OPENAI_BASE_URL = None
+WORD_INFO_MODEL = "gpt-4o-mini"
+WORD_INFO_MAX_TOKENS = 256
+# Words per prompt of generate_word_info_batch.
+WORD_INFO_BATCH_SIZE = 20
+WORD_INFO_FIELDS = ("meaning", "antonyms", "synonyms", "examples", "transcription", "syllables")
+# The fields that differ between the forms of a word ("jump", "jumped"); the others
+# are shared by every form of a lemma.
+WORD_FORM_FIELDS = ("transcription", "syllables")
+WORD_FORM_MAX_TOKENS = 64
+# Bump when the word information prompts change, so cached answers are regenerated.
+WORD_INFO_PROMPT_VERSION = 1
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+_client = None
+_stats_lock = threading.Lock()
+_stats = {
+    "batch_calls": 0,
+    "single_calls": 0,
+    "batched_words": 0,
+    "fallback_words": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "estimated_prompt_tokens_saved": 0,
+}
 
-def chat_with_gpt(prompt, model="gpt-3.5-turbo", temperature=0.7, max_tokens=256):
+def get_client():
     """
-    Sends a prompt to the OpenAI ChatGPT API and returns the response.
+    Returns the shared OpenAI client, created on first use so that importing this
+    module needs no credentials.
+    """
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return _client
+
+def _complete(prompt, model, temperature, max_tokens):
+    """
+    Sends a prompt and returns (content, usage), usage being the API's token counts or None.
     """
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model=model,
         messages=[{"role": "user", "content": prompt}],
         temperature=temperature,
         max_tokens=max_tokens
     )
     content = response.choices[0].message.content
-    return content.strip() if content else ""
+    return (content.strip() if content else ""), response.usage
 
-def generate_word_info(word):
+def _record(calls_key, usage, **counts):
+    with _stats_lock:
+        _stats[calls_key] += 1
+        if usage is not None:
+            _stats["prompt_tokens"] += usage.prompt_tokens or 0
+            _stats["completion_tokens"] += usage.completion_tokens or 0
+        for key, value in counts.items():
+            _stats[key] += value
+
+def chat_with_gpt(prompt, model="gpt-3.5-turbo", temperature=0.7, max_tokens=256):
     """
-    Uses GPT-4o-mini to generate antonyms, synonyms, examples, transcription, and syllables for the given word.
-    Returns a dictionary with these fields.
+    Sends a prompt to the OpenAI ChatGPT API and returns the response.
     """
-    import json
-    prompt = f"""
+    content, _ = _complete(prompt, model, temperature, max_tokens)
+    return content
+
+def _word_info_prompt(word):
+    return f"""
         For the English word '{word}', provide the following as a JSON object with these keys:
         - meaning: the meaning of the word
         - antonyms: a comma-separated string of antonyms
@@ -42,18 +90,200 @@ def generate_word_info(word):
         "syllables": "..."
         }}
     """
-    response = chat_with_gpt(prompt, model="gpt-4o-mini", temperature=0.2, max_tokens=256)
+
+def _word_info_batch_prompt(words):
+    return f"""
+        For each English word in the list below, provide the following as a JSON array with
+        one object per word, in the same order, with these keys:
+        - word: the word exactly as given
+        - meaning: the meaning of the word
+        - antonyms: a comma-separated string of antonyms
+        - synonyms: a comma-separated string of synonyms
+        - examples: three example sentences using the word
+        - transcription: the IPA transcription of the word
+        - syllables: the word broken down into syllables, separated by hyphens
+        Words: {json.dumps(words)}
+        Example output:
+        [
+        {{"word": "...", "meaning": "...", "antonyms": "...", "synonyms": "...", "examples": "...", "transcription": "...", "syllables": "..."}}
+        ]
+        Answer with the JSON array only.
+    """
+
+def _word_form_prompt(word):
+    return f"""
+        For the English word '{word}', provide the following as a JSON object with these keys:
+        - transcription: the IPA transcription of the word
+        - syllables: the word broken down into syllables, separated by hyphens
+        Example output:
+        {{
+        "transcription": "...",
+        "syllables": "..."
+        }}
+    """
+
+def _word_form_batch_prompt(words):
+    return f"""
+        For each English word in the list below, provide the following as a JSON array with
+        one object per word, in the same order, with these keys:
+        - word: the word exactly as given
+        - transcription: the IPA transcription of the word
+        - syllables: the word broken down into syllables, separated by hyphens
+        Words: {json.dumps(words)}
+        Example output:
+        [
+        {{"word": "...", "transcription": "...", "syllables": "..."}}
+        ]
+        Answer with the JSON array only.
+    """
+
+def _parse_json(response, pattern):
     try:
-        info = json.loads(response)
+        return json.loads(response)
     except Exception:
         # Try to extract JSON from response if not pure JSON
-        import re
-        match = re.search(r'\{.*\}', response, re.DOTALL)
+        match = re.search(pattern, response, re.DOTALL)
         if match:
-            info = json.loads(match.group(0))
-        else:
-            raise ValueError("Could not parse GPT response as JSON: " + response)
-    return info
+            return json.loads(match.group(0))
+        raise ValueError("Could not parse GPT response as JSON: " + response)
+
+def generate_word_info(word):
+    """
+    Uses GPT-4o-mini to generate antonyms, synonyms, examples, transcription, and syllables for the given word.
+    Returns a dictionary with these fields.
+    """
+    response, usage = _complete(
+        _word_info_prompt(word), WORD_INFO_MODEL, temperature=0.2, max_tokens=WORD_INFO_MAX_TOKENS
+    )
+    _record("single_calls", usage)
+    return _parse_json(response, r'\{.*\}')
+
+def generate_word_form(word):
+    """
+    Like generate_word_info, for the form-specific fields (WORD_FORM_FIELDS) only.
+    """
+    response, usage = _complete(
+        _word_form_prompt(word), WORD_INFO_MODEL, temperature=0.2, max_tokens=WORD_FORM_MAX_TOKENS
+    )
+    _record("single_calls", usage)
+    return _parse_json(response, r'\{.*\}')
+
+def validate_word_info(entry, fields=WORD_INFO_FIELDS):
+    """
+    Checks one generated entry and returns its fields without the 'word' key. Every
+    field must be present as a string; examples may also be a list of strings.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"Expected a JSON object, got {entry!r}")
+    for field in fields:
+        value = entry.get(field)
+        if field == "examples" and isinstance(value, list) and all(isinstance(v, str) for v in value):
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f"Field '{field}' is missing or not a string in {entry!r}")
+    if "meaning" in fields and not entry["meaning"].strip():
+        raise ValueError(f"Empty meaning in {entry!r}")
+    return {field: entry[field] for field in fields}
+
+# (batched prompt, single-word prompt, single-word fallback, fields, max tokens per word)
+_WORD_INFO_KIND = (_word_info_batch_prompt, _word_info_prompt, generate_word_info, WORD_INFO_FIELDS, WORD_INFO_MAX_TOKENS)
+_WORD_FORM_KIND = (_word_form_batch_prompt, _word_form_prompt, generate_word_form, WORD_FORM_FIELDS, WORD_FORM_MAX_TOKENS)
+
+def _generate_chunk(words, kind):
+    """
+    Returns ({word: info}, {word: error}) for one prompt's worth of words. Errors of the
+    API call itself are raised; errors in the response are reported per word.
+    """
+    batch_prompt, single_prompt, _, fields, max_tokens = kind
+    prompt = batch_prompt(words)
+    response, usage = _complete(
+        prompt, WORD_INFO_MODEL, temperature=0.2, max_tokens=max_tokens * len(words)
+    )
+    infos, errors = {}, {}
+    try:
+        entries = _parse_json(response, r'\[.*\]')
+        if not isinstance(entries, list):
+            raise ValueError("Expected a JSON array, got: " + response)
+    except ValueError as e:
+        errors = {word: e for word in words}
+    else:
+        # Each entry is checked on its own, so one malformed entry only costs its word
+        wanted = {word.lower(): word for word in words}
+        for entry in entries:
+            word = wanted.get(str(entry.get("word", "")).strip().lower()) if isinstance(entry, dict) else None
+            if word is None or word in infos:
+                continue
+            try:
+                infos[word] = validate_word_info(entry, fields)
+            except ValueError as e:
+                errors[word] = e
+        for word in words:
+            if word in infos:
+                errors.pop(word, None)
+            elif word not in errors:
+                errors[word] = ValueError(f"No entry for '{word}' in the response")
+
+    # The prompts the words would have needed on their own, minus the batched one
+    saved = 0
+    if usage is not None and usage.prompt_tokens:
+        tokens_per_char = usage.prompt_tokens / len(prompt)
+        saved = round(sum(len(single_prompt(word)) for word in words) * tokens_per_char) - usage.prompt_tokens
+    _record("batch_calls", usage, batched_words=len(words), estimated_prompt_tokens_saved=saved)
+    return infos, errors
+
+def _generate_batch(words, batch_size, kind):
+    words = list(dict.fromkeys(words))
+    infos, errors, invalid = {}, {}, []
+    for i in range(0, len(words), batch_size):
+        chunk = words[i:i + batch_size]
+        try:
+            chunk_infos, chunk_errors = _generate_chunk(chunk, kind)
+        except Exception as e:
+            errors.update((word, e) for word in chunk)
+            continue
+        infos.update(chunk_infos)
+        invalid.extend(chunk_errors)
+
+    fallback, fields = kind[2], kind[3]
+    for word in invalid:
+        with _stats_lock:
+            _stats["fallback_words"] += 1
+        try:
+            # Held to the same checks as the batched entries
+            infos[word] = validate_word_info(fallback(word), fields)
+        except Exception as e:
+            errors[word] = e
+    return infos, errors
+
+def generate_word_info_batch(words, batch_size=WORD_INFO_BATCH_SIZE):
+    """
+    Generates the information of many words with one prompt per batch_size words.
+    Entries that are missing or fail validation fall back to generate_word_info, whose
+    answers are validated the same way; when the batched call itself fails, its words
+    are reported as failed without retrying.
+
+    Returns:
+    - tuple: ({word: info}, {word: exception}) covering every distinct word.
+    """
+    return _generate_batch(words, batch_size, _WORD_INFO_KIND)
+
+def generate_word_forms_batch(words, batch_size=WORD_INFO_BATCH_SIZE):
+    """
+    Same as generate_word_info_batch for the form-specific fields only, with
+    generate_word_form as the per-word fallback.
+    """
+    return _generate_batch(words, batch_size, _WORD_FORM_KIND)
+
+def word_info_stats():
+    """
+    Calls and tokens spent on word information, and the calls and prompt tokens the
+    batched prompts saved compared with one call per word.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["calls"] = stats["batch_calls"] + stats["single_calls"]
+    stats["calls_saved"] = stats["batched_words"] - stats["batch_calls"] - stats["fallback_words"]
+    return stats
 
 # Example usage
 def example():
@@ -62,4 +292,4 @@ def example():
     print("GPT response:", answer)
 
 if __name__ == "__main__":
-    example() 
\ No newline at end of file
+    example()
@@ -1,12 +1,12 @@
 import os
-import sqlite3
+import json
 from docx import Document
 from db.gpt_api import generate_word_info
-import sqlite3
+from db.connection import BOOK_DB, BOOK_DB_PATH, RESULTS_DB, RESULT_DB_PATH
 
 BOOKS_DIR = r"D:\Canada research\frontend\assets\books"
-BOOK_DB_PATH = "db/book.db"
-RESULT_DB_PATH = "db/results.db"
+# Words per IN (...) query of get_existing_word_ids, below SQLite's bound-parameter limit.
+EXISTING_WORDS_LOOKUP_CHUNK = 500
 
 def get_word_file():
     files = [f for f in os.listdir(BOOKS_DIR) if f.lower().endswith('.docx')]
@@ -37,15 +37,11 @@ def split_into_fragments(text, sentences_per_fragment=3):
     return fragments
 
 def insert_fragments_to_db(fragments, book_id):
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    for frag in fragments:
-        cur.execute(
+    with BOOK_DB.transaction() as conn:
+        conn.executemany(
             "INSERT INTO book_fragments (book_id, chapter_name, text) VALUES (?, ?, ?)",
-            (book_id, None, frag)
+            [(book_id, None, frag) for frag in fragments]
         )
-    conn.commit()
-    conn.close()
     print(f"Inserted {len(fragments)} fragments into book_fragments table.")
 
 # def print_table(table_name):
@@ -69,26 +65,17 @@ def add_result_text_record(read_part, results_analysis):
     - read_part: the part of the text the child has read
     - results_analysis: the analysis result (as string)
     """
-    import sqlite3
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    RESULTS_DB.execute(
         "INSERT INTO text (student_index, read_part, results_analysis) VALUES (?, ?, ?)",
         (1, read_part, str(results_analysis))
     )
-    conn.commit()
-    conn.close()
 
 def find_fragment_by_text(search_text):
     """
     Searches for a fragment in the book_fragments table by the exact 'text' column value.
     Returns the fragment_id (index) if found, else None.
     """
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT fragment_id FROM book_fragments WHERE text = ?", (search_text,))
-    result = cur.fetchone()
-    conn.close()
+    result = BOOK_DB.fetchone("SELECT fragment_id FROM book_fragments WHERE text = ?", (search_text,))
     if result:
         return result[0]
     else:
@@ -100,8 +87,6 @@ def update_fragment_by_id(fragment_id, new_text=None, new_chapter_name=None):
     Only updates fields that are not None.
     Returns True if update was successful (row existed), False otherwise.
     """
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
     fields = []
     values = []
     if new_text is not None:
@@ -111,15 +96,10 @@ def update_fragment_by_id(fragment_id, new_text=None, new_chapter_name=None):
         fields.append("chapter_name = ?")
         values.append(new_chapter_name)
     if not fields:
-        conn.close()
         return False  # Nothing to update
     values.append(fragment_id)
     sql = f"UPDATE book_fragments SET {', '.join(fields)} WHERE fragment_id = ?"
-    cur.execute(sql, values)
-    conn.commit()
-    updated = cur.rowcount > 0
-    conn.close()
-    return updated
+    return BOOK_DB.execute(sql, values).rowcount > 0
 
 
 def find_text_record_by_read_part(read_part):
@@ -127,11 +107,7 @@ def find_text_record_by_read_part(read_part):
     Searches for a record in the text table by the exact read_part value.
     Returns the text_index if found, else None.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT text_index FROM text WHERE read_part = ?", (read_part,))
-    result = cur.fetchone()
-    conn.close()
+    result = RESULTS_DB.fetchone("SELECT text_index FROM text WHERE read_part = ?", (read_part,))
     if result:
         return result[0]
     else:
@@ -143,88 +119,156 @@ def update_text_record_by_read_part(read_part, new_results_analysis):
     Updates the results_analysis of a record in the text table by its read_part.
     Returns True if update was successful, False otherwise.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    cur = RESULTS_DB.execute(
         "UPDATE text SET results_analysis = ? WHERE read_part = ?",
         (str(new_results_analysis), read_part)
     )
-    conn.commit()
-    updated = cur.rowcount > 0
-    conn.close()
-    return updated
+    return cur.rowcount > 0
 
 #------------------------BOOK.EXISTING_WORDS----------------------------
 def fill_existing_words(word):
     """
     Uses GPT to generate meaning, antonyms, synonyms, examples, transcription, and syllables for the given word,
     and inserts a new record into the existing_words table in book.db.
+    Returns the id of the word's record.
     """
     info = generate_word_info(word)
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO existing_words (word, meaning, antonyms, synonyms, examples, transcription, syllables) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    word_id = add_existing_word(word)
+    save_existing_word_info(word, info)
+    return word_id
+
+def add_existing_word(word):
+    """
+    Inserts the word into the existing_words table without its generated information,
+    which save_existing_word_info fills in later. Until then the word is left out of the
+    vocabulary and pronunciation screens.
+    Returns the id of the word's record.
+    """
+    # Another request may have added the word meanwhile; word is unique.
+    BOOK_DB.execute("INSERT OR IGNORE INTO existing_words (word) VALUES (?)", (word,))
+    return word_exists_in_existing_words(word)
+
+def save_existing_word_info(word, info):
+    """
+    Stores the generated information (as returned by generate_word_info) of a word
+    already in the existing_words table.
+    """
+    BOOK_DB.execute(
+        "UPDATE existing_words SET meaning = ?, antonyms = ?, synonyms = ?, examples = ?, transcription = ?, syllables = ? WHERE word = ?",
         (
-            word,
             info.get("meaning", ""),
             info.get("antonyms", ""),
             info.get("synonyms", ""),
             ", ".join(info.get("examples", [])) if isinstance(info.get("examples", ""), list) else info.get("examples", ""),
             info.get("transcription", ""),
-            info.get("syllables", "")
+            info.get("syllables", ""),
+            word
         )
     )
-    conn.commit()
-    conn.close()
-    return True
+
+def save_existing_word_syllables(word, syllables):
+    """
+    Fills in only the syllables of a word that has none yet, so it shows up on the
+    pronunciation screen while its generated information is missing.
+    """
+    BOOK_DB.execute(
+        "UPDATE existing_words SET syllables = ? WHERE word = ? AND syllables IS NULL", (syllables, word)
+    )
 
 def word_exists_in_existing_words(word):
     """
     Checks if the given word exists in the existing_words table in book.db.
     Returns the index (rowid) if it exists, -1 otherwise.
-    If the word is empty or None, or the table is empty, returns -1 immediately.
+    If the word is empty or None, returns -1 immediately.
     """
     if not word:
         return -1
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    # Check if the table is empty
-    cur.execute("SELECT COUNT(*) FROM existing_words")
-    count = cur.fetchone()[0]
-    if count == 0:
-        conn.close()
-        return -1
-    cur.execute("SELECT rowid FROM existing_words WHERE word = ? LIMIT 1", (word,))
-    row = cur.fetchone()
-    conn.close()
+    row = BOOK_DB.fetchone("SELECT id FROM existing_words WHERE word = ?", (word,))
     return row[0] if row else -1
 
+def get_existing_word_ids(words):
+    """
+    Bulk version of word_exists_in_existing_words: returns {word: id} for the given
+    words that exist in the existing_words table, in one indexed query per chunk.
+    """
+    words = list(dict.fromkeys(w for w in words if w))
+    ids = {}
+    for i in range(0, len(words), EXISTING_WORDS_LOOKUP_CHUNK):
+        chunk = words[i:i + EXISTING_WORDS_LOOKUP_CHUNK]
+        rows = BOOK_DB.fetchall(
+            f"SELECT word, id FROM existing_words WHERE word IN ({', '.join('?' * len(chunk))})",
+            chunk
+        )
+        ids.update((row[0], row[1]) for row in rows)
+    return ids
+
 def syllables_from_existing_words(word):
     """
-    Checks if the given word exists in the existing_words table in book.db.
-    Returns the index (rowid) if it exists, -1 otherwise.
-    If the word is empty or None, or the table is empty, returns -1 immediately.
+    Returns the syllables stored for the given word in the existing_words table in book.db,
+    or -1 if the word is empty, None or not in the table.
     """
     if not word:
         return -1
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    # Check if the table is empty
-    cur.execute("SELECT COUNT(*) FROM existing_words")
-    count = cur.fetchone()[0]
-    if count == 0:
-        conn.close()
-        return -1
-    cur.execute("SELECT syllables FROM existing_words WHERE word = ? LIMIT 1", (word,))
-    row = cur.fetchone()
-    conn.close()
+    row = BOOK_DB.fetchone("SELECT syllables FROM existing_words WHERE word = ?", (word,))
     return row[0] if row else -1
 
-def get_random_meanings_except(excluded_meaning):
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
+#------------------------BOOK.REFERENCE_PRONUNCIATIONS----------------------------
+def get_reference_pronunciation(word):
+    """
+    Returns the stored TTS reference for the word as a dictionary with
+    'word', 'audio_base64' and 'transcription', or None if it was never generated.
+    """
+    row = BOOK_DB.fetchone(
+        "SELECT word, audio_base64, transcription FROM reference_pronunciations WHERE word = ?",
+        (word,)
+    )
+    return dict(row) if row else None
 
+def save_reference_pronunciation(word, audio_base64, transcription):
+    """
+    Stores the TTS reference audio of a word together with its Whisper transcription.
+    """
+    BOOK_DB.execute(
+        "INSERT OR REPLACE INTO reference_pronunciations (word, audio_base64, transcription) VALUES (?, ?, ?)",
+        (word, audio_base64, transcription)
+    )
+
+#------------------------BOOK.FRAGMENT_ANALYSIS----------------------------
+def _fragment_analysis_from_row(row):
+    if row is None:
+        return None
+    stored = dict(row)
+    stored["analysis"] = json.loads(stored["analysis"])
+    return stored
+
+def get_fragment_analysis(fragment_id):
+    """
+    Returns the stored text analysis of a fragment as a dictionary with 'fragment_id',
+    'text_hash', 'analysis_version', 'model_name', 'model_version' and 'analysis',
+    or None if it was never computed.
+    """
+    row = BOOK_DB.fetchone("SELECT * FROM fragment_analysis WHERE fragment_id = ?", (fragment_id,))
+    return _fragment_analysis_from_row(row)
+
+def find_fragment_analysis_by_text_hash(text_hash):
+    """
+    Same as get_fragment_analysis, for callers that only know the fragment text.
+    """
+    row = BOOK_DB.fetchone("SELECT * FROM fragment_analysis WHERE text_hash = ? LIMIT 1", (text_hash,))
+    return _fragment_analysis_from_row(row)
+
+def save_fragment_analysis(fragment_id, text_hash, analysis_version, model_name, model_version, analysis):
+    """
+    Stores (or replaces) the text analysis of a fragment.
+    """
+    BOOK_DB.execute(
+        "INSERT OR REPLACE INTO fragment_analysis "
+        "(fragment_id, text_hash, analysis_version, model_name, model_version, analysis) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (fragment_id, text_hash, analysis_version, model_name, model_version, json.dumps(analysis))
+    )
+
+def get_random_meanings_except(excluded_meaning):
     query = """
     SELECT id, meaning 
     FROM existing_words 
@@ -233,19 +277,13 @@ def get_random_meanings_except(excluded_meaning):
     LIMIT 3
     """
 
-    cur.execute(query, (excluded_meaning,))
-    rows = cur.fetchall()
-    conn.close()
+    rows = BOOK_DB.fetchall(query, (excluded_meaning,))
 
     result = [{"id": row[0], "meaning": row[1]} for row in rows]
     return result
 
     
 def get_words_vocabulary():
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    conn.execute(f"ATTACH DATABASE '{BOOK_DB_PATH}' AS book")
-
     query = """
     SELECT 
         m.word_index, 
@@ -257,13 +295,12 @@ def get_words_vocabulary():
         b.examples
     FROM mistakes m
     JOIN book.existing_words b ON m.word_index = b.id
-    WHERE m.recognized_by_meaning < 5
+    WHERE m.recognized_by_meaning < 5 AND b.meaning IS NOT NULL
     """
-    cur.execute(query)
-    results = cur.fetchall()
+    results = RESULTS_DB.fetchall(query)
     print("AAAAA")
     vocab = []
-    print("results:", results)
+    print("results:", [tuple(row) for row in results])
     for word_data in results:
         rand_meanings = get_random_meanings_except(word_data[3])
         # Extract just the meaning strings from the objects
@@ -281,7 +318,6 @@ def get_words_vocabulary():
             "options": options
         })
 
-    conn.close()
     return vocab
 
 #------------------------RESULTS.MISTAKES----------------------------
@@ -294,26 +330,17 @@ def add_mistake(word, word_id):
     4. pronounced_correctly (int, max 5, set to 0 at creation)
     Before inserting, checks if the mistakes table is not empty.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
     # Check if the mistakes table is not empty
-    cur.execute("SELECT COUNT(*) FROM mistakes")
-    count = cur.fetchone()[0]
+    count = RESULTS_DB.fetchone("SELECT COUNT(*) FROM mistakes")[0]
     if count == 0:
         print("The mistakes table is currently empty.")
     # Insert into mistakes table
-    cur.execute(
+    RESULTS_DB.execute(
         "INSERT INTO mistakes (student_index, word_index, recognized_by_meaning, pronounced_correctly) VALUES (?, ?, ?, ?)",
         (1, word_id, 0, 0)
     )
-    conn.commit()
-    conn.close()
 
 def get_mistakes_with_words():
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    conn.execute(f"ATTACH DATABASE '{BOOK_DB_PATH}' AS book")
-
     query = """
     SELECT 
         m.word_index, 
@@ -323,13 +350,12 @@ def get_mistakes_with_words():
         b.syllables
     FROM mistakes m
     JOIN book.existing_words b ON m.word_index = b.id
-    WHERE m.pronounced_correctly < 5
+    WHERE m.pronounced_correctly < 5 AND b.syllables IS NOT NULL
     """
-    cur.execute(query)
-    results = cur.fetchall()
+    results = RESULTS_DB.fetchall(query)
 
     mistakes = []
-    print("results:", results)
+    print("results:", [tuple(row) for row in results])
     for word_data in results:
         mistakes.append({
             "id": word_data[0],
@@ -339,7 +365,6 @@ def get_mistakes_with_words():
             "segments": word_data[4].split("-") if word_data[4] else []
         })
 
-    conn.close()
     return mistakes
 
 def check_word_mastery(word_id):
@@ -347,14 +372,10 @@ def check_word_mastery(word_id):
     Checks if a word in the mistakes table has both recognized_by_meaning and pronounced_correctly equal to 5.
     Returns True if both are 5, False otherwise.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    row = RESULTS_DB.fetchone(
         "SELECT recognized_by_meaning, pronounced_correctly FROM mistakes WHERE word_index = ?",
         (word_id,)
     )
-    row = cur.fetchone()
-    conn.close()
     
     if row:
         recognized, pronounced = row
@@ -367,14 +388,10 @@ def increase_recognition(word_id):
     Increases the recognized_by_meaning field by 1 for the given word_id.
     If the value is already 5, nothing happens.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    RESULTS_DB.execute(
         "UPDATE mistakes SET recognized_by_meaning = recognized_by_meaning + 1 WHERE word_index = ? AND recognized_by_meaning < 5",
         (word_id,)
     )
-    conn.commit()
-    conn.close()
 
 
 #------------------------BOOK.FRAGMENTS----------------------------
@@ -383,28 +400,33 @@ def get_fragment_by_id(fragment_id):
     Returns the fragment record from the book_fragments table by the given fragment_id and book_id.
     Returns a dictionary with the fragment data or None if not found.
     """
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM book_fragments WHERE fragment_id = ?", (fragment_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = BOOK_DB.fetchone("SELECT * FROM book_fragments WHERE fragment_id = ?", (fragment_id,))
     if row:
         return dict(row)
     else:
         return None
 
 
+def get_fragments(book_id=None):
+    """
+    Returns the fragment_id and text of every fragment, or of one book's fragments.
+    """
+    if book_id is None:
+        rows = BOOK_DB.fetchall("SELECT fragment_id, text FROM book_fragments ORDER BY fragment_id")
+    else:
+        rows = BOOK_DB.fetchall(
+            "SELECT fragment_id, text FROM book_fragments WHERE book_id = ? ORDER BY fragment_id",
+            (book_id,)
+        )
+    return [dict(row) for row in rows]
+
+
 def get_first_fragment_id(book_id):
     """
     Returns the ID of the first fragment for the specified book from the book_fragments table.
     Returns None if no fragments are found for the book.
     """
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT MIN(fragment_id) FROM book_fragments WHERE book_id = ?", (book_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = BOOK_DB.fetchone("SELECT MIN(fragment_id) FROM book_fragments WHERE book_id = ?", (book_id,))
     return row[0] if row and row[0] is not None else 0
 
 def get_last_fragment_id(book_id):
@@ -412,11 +434,7 @@ def get_last_fragment_id(book_id):
     Returns the ID of the last fragment for the specified book from the book_fragments table.
     Returns 0 if no fragments are found for the book.
     """
-    conn = sqlite3.connect(BOOK_DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT MAX(fragment_id) FROM book_fragments WHERE book_id = ?", (book_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = BOOK_DB.fetchone("SELECT MAX(fragment_id) FROM book_fragments WHERE book_id = ?", (book_id,))
     return row[0] if row and row[0] is not None else 0
 
 def increase_recognition(word_id):
@@ -424,14 +442,10 @@ def increase_recognition(word_id):
     Increases the recognized_by_meaning value for a word in the mistakes table.
     The value is capped at 5.
     """
-    conn = sqlite3.connect(RESULT_DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    RESULTS_DB.execute(
         "UPDATE mistakes SET recognized_by_meaning = recognized_by_meaning + 1 WHERE word_index = ? AND recognized_by_meaning < 5",
         (word_id,)
     )
-    conn.commit()
-    conn.close()
     return True
 
 
@@ -0,0 +1,406 @@
+"""
+Background generation of word information (meaning, synonyms, IPA, syllables...) for
+the words a child missed.
+
+Jobs are rows of the enrichment_jobs table in book.db, so queued words survive a
+restart. A small pool of worker threads claims them a batch at a time, asks the
+configured provider for the words' information (through the lemma cache of
+word_info_cache.py) and stores it in existing_words. Failed jobs are
+retried with exponential backoff; a job whose worker died is claimed again once its
+lease expires. A word whose job finally fails gets pyphen syllables, so it still
+shows up on the pronunciation screen, and is listed under "alerts" of stats() until
+`retry-failed` requeues it.
+
+Usage (from the backend directory):
+    python enrichment_queue.py status
+    python enrichment_queue.py retry-failed
+    python enrichment_queue.py run [--provider stub]
+"""
+import argparse
+import random
+import threading
+import time
+from pyphen import Pyphen
+from db.connection import BOOK_DB
+from db.help import save_existing_word_info, save_existing_word_syllables
+from word_info_cache import WORD_INFO_CACHE
+
+# Where word information comes from, one of ENRICHMENT_PROVIDERS. "stub" needs no
+# network and is meant for development and tests.
+ENRICHMENT_PROVIDER = "openai"
+ENRICHMENT_WORKERS = 2
+# Jobs a worker claims at once; the OpenAI provider asks for all of them in one prompt.
+ENRICHMENT_BATCH_SIZE = 10
+ENRICHMENT_MAX_ATTEMPTS = 5
+# Retry n waits ENRICHMENT_BACKOFF_SECONDS * 2 ** (n - 1), at most ENRICHMENT_BACKOFF_MAX_SECONDS.
+ENRICHMENT_BACKOFF_SECONDS = 5.0
+ENRICHMENT_BACKOFF_MAX_SECONDS = 600.0
+# A claimed job that is not finished within the lease is handed to another worker.
+ENRICHMENT_LEASE_SECONDS = 120.0
+# How often idle workers look for jobs that became due (retries, expired leases).
+ENRICHMENT_POLL_SECONDS = 1.0
+
+PENDING = "pending"
+RUNNING = "running"
+FAILED = "failed"
+# Failed words listed in the alerts of EnrichmentQueue.stats().
+ALERT_FAILED_WORDS = 20
+
+_PYPHEN = Pyphen(lang="en_US")
+
+
+def fallback_syllables(word):
+    """
+    Hyphenated syllables of a word from pyphen's dictionary, without any API call.
+    """
+    return _PYPHEN.inserted(word)
+
+
+class OpenAIWordInfoProvider:
+    name = "openai"
+
+    @property
+    def prompt_version(self):
+        """
+        What cached answers of this provider are keyed by.
+        """
+        from db.gpt_api import WORD_INFO_PROMPT_VERSION
+
+        return f"openai-v{WORD_INFO_PROMPT_VERSION}"
+
+    def word_info_many(self, words):
+        """
+        Returns ({word: info}, {word: exception}) for the given words.
+        """
+        from db.gpt_api import generate_word_info_batch
+
+        return generate_word_info_batch(words)
+
+    def word_forms_many(self, words):
+        """
+        Same as word_info_many for the form-specific fields (IPA, syllables) only.
+        """
+        from db.gpt_api import generate_word_forms_batch
+
+        return generate_word_forms_batch(words)
+
+    def stats(self):
+        from db.gpt_api import word_info_stats
+
+        return word_info_stats()
+
+
+class StubWordInfoProvider:
+    """
+    Local stand-in for the GPT provider: syllables come from pyphen and the other
+    fields are placeholders. latency_seconds and failure_rate simulate a remote API.
+    """
+
+    name = "stub"
+    prompt_version = "stub"
+
+    def __init__(self, latency_seconds=0.0, failure_rate=0.0, seed=None):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def word_info(self, word):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise RuntimeError(f"Stub provider failed for '{word}'.")
+        return {
+            "meaning": f"The word '{word}'.",
+            "antonyms": "",
+            "synonyms": "",
+            "examples": [f"This sentence uses the word {word}."],
+            "transcription": "",
+            "syllables": fallback_syllables(word),
+        }
+
+    def word_form(self, word):
+        info = self.word_info(word)
+        return {"transcription": info["transcription"], "syllables": info["syllables"]}
+
+    def word_info_many(self, words):
+        return self._many(self.word_info, words)
+
+    def word_forms_many(self, words):
+        return self._many(self.word_form, words)
+
+    @staticmethod
+    def _many(generate, words):
+        infos, errors = {}, {}
+        for word in words:
+            try:
+                infos[word] = generate(word)
+            except Exception as e:
+                errors[word] = e
+        return infos, errors
+
+    def stats(self):
+        return {}
+
+
+ENRICHMENT_PROVIDERS = {
+    OpenAIWordInfoProvider.name: OpenAIWordInfoProvider,
+    StubWordInfoProvider.name: StubWordInfoProvider,
+}
+
+
+def backoff_seconds(attempts):
+    return min(ENRICHMENT_BACKOFF_SECONDS * 2 ** (attempts - 1), ENRICHMENT_BACKOFF_MAX_SECONDS)
+
+
+class EnrichmentQueue:
+    """
+    Persistent queue of words waiting for their information, worked off by up to
+    `workers` background threads.
+    """
+
+    def __init__(
+        self,
+        db=BOOK_DB,
+        provider=ENRICHMENT_PROVIDER,
+        workers=ENRICHMENT_WORKERS,
+        batch_size=ENRICHMENT_BATCH_SIZE,
+        max_attempts=ENRICHMENT_MAX_ATTEMPTS,
+        store=save_existing_word_info,
+        store_syllables=save_existing_word_syllables,
+        cache=WORD_INFO_CACHE,
+    ):
+        self.db = db
+        self.provider = ENRICHMENT_PROVIDERS[provider]() if isinstance(provider, str) else provider
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._store = store
+        self._store_syllables = store_syllables
+        self.cache = cache
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def enqueue(self, words, start=True):
+        """
+        Queues the words that are not queued yet and returns right away; with
+        start=False the jobs are only stored, for the workers of another process.
+        Returns the number of words queued.
+        """
+        now = time.time()
+        words = list(dict.fromkeys(w for w in words if w))
+        if not words:
+            return 0
+        with self.db.transaction() as conn:
+            queued = conn.executemany(
+                "INSERT OR IGNORE INTO enrichment_jobs (word, status, attempts, available_at, created_at) "
+                "VALUES (?, ?, 0, ?, ?)",
+                [(word, PENDING, now, now) for word in words],
+            ).rowcount
+        if start:
+            self.start()
+            self._wake.set()
+        return queued
+
+    def start(self):
+        """
+        Starts the worker threads, replacing any that died; jobs left over from a
+        previous run are picked up.
+        """
+        if len(self._threads) == self.workers and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._start_lock:
+            if not self._threads:
+                self._stop.clear()
+            alive = [thread for thread in self._threads if thread.is_alive()]
+            started = [
+                threading.Thread(target=self._run, name=f"word-enrichment-{i}", daemon=True)
+                for i in range(len(alive), self.workers)
+            ]
+            self._threads = alive + started
+            for thread in started:
+                thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wait_idle(self, timeout=None):
+        """
+        Blocks until no job is pending or running (failed jobs do not count).
+        Returns False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(self.counts().get(status) for status in (PENDING, RUNNING)):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def retry_failed(self):
+        """
+        Gives every failed job a fresh set of attempts. Returns the number of jobs requeued.
+        """
+        requeued = self.db.execute(
+            "UPDATE enrichment_jobs SET status = ?, attempts = 0, available_at = ? WHERE status = ?",
+            (PENDING, time.time(), FAILED),
+        ).rowcount
+        self._wake.set()
+        return requeued
+
+    def counts(self):
+        rows = self.db.fetchall("SELECT status, COUNT(*) FROM enrichment_jobs GROUP BY status")
+        return {row[0]: row[1] for row in rows}
+
+    def alerts(self):
+        """
+        Problems an operator has to act on: words whose information could not be
+        generated are missing from the vocabulary screen until `retry-failed`.
+        """
+        rows = self.db.fetchall(
+            "SELECT word, last_error FROM enrichment_jobs WHERE status = ? ORDER BY available_at DESC LIMIT ?",
+            (FAILED, ALERT_FAILED_WORDS),
+        )
+        if not rows:
+            return []
+        failed = self.counts().get(FAILED, 0)
+        return [{
+            "alert": "failed_word_enrichment",
+            "message": f"{failed} words have no generated information and are hidden from the vocabulary "
+                       "screen; run `python enrichment_queue.py retry-failed`.",
+            "failed_jobs": failed,
+            "words": {row[0]: row[1] for row in rows},
+        }]
+
+    def stats(self):
+        return {
+            "alerts": self.alerts(),
+            "provider": self.provider.name,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "running_workers": sum(thread.is_alive() for thread in self._threads),
+            "jobs": self.counts(),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "provider_stats": self.provider.stats(),
+            "cache": self.cache.stats(),
+        }
+
+    def _claim(self):
+        """
+        Marks up to batch_size due jobs as running under a lease and returns
+        {word: attempts}, empty if nothing is due.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT word, attempts FROM enrichment_jobs "
+                "WHERE status IN (?, ?) AND available_at <= ? ORDER BY available_at LIMIT ?",
+                (PENDING, RUNNING, now, self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE enrichment_jobs SET status = ?, attempts = attempts + 1, available_at = ? WHERE word = ?",
+                [(RUNNING, now + ENRICHMENT_LEASE_SECONDS, row[0]) for row in rows],
+            )
+        return {row[0]: row[1] + 1 for row in rows}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                jobs = self._claim()
+            except Exception as e:
+                print(f"Word enrichment queue error: {e}")
+                jobs = {}
+            if not jobs:
+                self._wake.wait(ENRICHMENT_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            try:
+                self._process(jobs)
+            except Exception as e:
+                # Unfinished jobs stay running and are claimed again once their lease expires
+                print(f"Word enrichment queue error: {e}")
+                self._stop.wait(ENRICHMENT_POLL_SECONDS)
+
+    def _process(self, jobs):
+        try:
+            infos, errors = self.cache.word_info_many(list(jobs), self.provider)
+        except Exception as e:
+            infos, errors = {}, {word: e for word in jobs}
+        stored = []
+        for word, info in infos.items():
+            try:
+                self._store(word, info)
+            except Exception as e:
+                errors[word] = e
+                continue
+            stored.append(word)
+            self.db.execute("DELETE FROM enrichment_jobs WHERE word = ?", (word,))
+            with self._stats_lock:
+                self.completed += 1
+        if stored:
+            self.cache.record_stored(stored, self.provider.prompt_version)
+        for word in jobs:
+            if word not in infos and word not in errors:
+                errors[word] = RuntimeError(f"Provider returned nothing for '{word}'.")
+        for word, e in errors.items():
+            self._failed(word, jobs[word], e)
+
+    def _failed(self, word, attempts, e):
+        if attempts >= self.max_attempts:
+            status, available_at = FAILED, time.time()
+            print(f"Giving up on word information for '{word}' after {attempts} attempts: {e}")
+            try:
+                self._store_syllables(word, fallback_syllables(word))
+            except Exception as store_error:
+                print(f"Could not store fallback syllables for '{word}': {store_error}")
+        else:
+            status, available_at = PENDING, time.time() + backoff_seconds(attempts)
+        self.db.execute(
+            "UPDATE enrichment_jobs SET status = ?, available_at = ?, last_error = ? WHERE word = ?",
+            (status, available_at, str(e), word),
+        )
+        with self._stats_lock:
+            if status == FAILED:
+                self.failed += 1
+            else:
+                self.retried += 1
+
+
+ENRICHMENT_QUEUE = EnrichmentQueue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the number of queued, running and failed jobs.")
+    commands.add_parser("retry-failed", help="Queue the failed jobs again.")
+    run = commands.add_parser("run", help="Work off the queue in the foreground, then exit.")
+    run.add_argument("--provider", choices=sorted(ENRICHMENT_PROVIDERS), default=ENRICHMENT_PROVIDER)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(ENRICHMENT_QUEUE.counts() or "No queued jobs.")
+        for alert in ENRICHMENT_QUEUE.alerts():
+            print(alert["message"])
+    elif args.command == "retry-failed":
+        print(f"Requeued {ENRICHMENT_QUEUE.retry_failed()} failed jobs.")
+    else:
+        queue = EnrichmentQueue(provider=args.provider)
+        queue.start()
+        queue.wait_idle()
+        queue.stop()
+        print(f"Completed {queue.completed} jobs, {queue.failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
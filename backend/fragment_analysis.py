@@ -0,0 +1,80 @@
+"""
+The text-only part of the reading assessment of a book fragment (normalized words,
+word complexities, readability metrics), stored in the fragment_analysis table of
+book.db so a reading only does the audio-dependent work.
+
+Needs only the complexity models of a WordComplexityPredictor, so the server and
+precompute_fragments.py share it without the rest of server_help.
+"""
+import hashlib
+from db.help import get_fragment_by_id, get_fragment_analysis, find_fragment_analysis_by_text_hash, save_fragment_analysis
+
+# Bump when FragmentAnalyzer.analyze changes, so stored fragment analyses are recomputed.
+FRAGMENT_ANALYSIS_VERSION = 1
+
+
+def fragment_text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class FragmentAnalyzer:
+    """
+    Computes, stores and looks up fragment analyses with the given predictor's models.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def analyze(self, original, model_name):
+        """
+        Runs the part of the reading assessment that only depends on the displayed text,
+        given as an AnalyzedText.
+        """
+        return {
+            "words": original.normalized_words,
+            "word_complexities": self.predictor.predict_many(original.words, model_name=model_name),
+            "readability_metrics": self.predictor.calculate_readability_metrics_many(original.sentences),
+        }
+
+    def is_current(self, stored, text_hash, model_name):
+        return (
+            stored is not None
+            and stored["text_hash"] == text_hash
+            and stored["analysis_version"] == FRAGMENT_ANALYSIS_VERSION
+            and stored["model_name"] == model_name
+            and stored["model_version"] == self.predictor.model_artifact_id
+        )
+
+    def store(self, fragment_id, original, model_name):
+        """
+        Computes and stores the text analysis of a book fragment, and returns it.
+        """
+        analysis = self.analyze(original, model_name)
+        save_fragment_analysis(
+            fragment_id, fragment_text_hash(original.text), FRAGMENT_ANALYSIS_VERSION,
+            model_name, self.predictor.model_artifact_id, analysis,
+        )
+        return analysis
+
+    def get(self, original, model_name, fragment_id=None):
+        """
+        Returns the text analysis of a fragment (an AnalyzedText), from book.db when it was
+        precomputed for this text, analysis version and model artifact. Looks the fragment
+        up by its text when the caller does not know its fragment_id.
+        """
+        text_hash = fragment_text_hash(original.text)
+        if fragment_id is not None:
+            stored = get_fragment_analysis(fragment_id)
+        else:
+            stored = find_fragment_analysis_by_text_hash(text_hash)
+        if self.is_current(stored, text_hash, model_name):
+            return stored["analysis"]
+
+        if stored is not None and stored["text_hash"] == text_hash:
+            # Same fragment, outdated analysis: refresh it in place.
+            return self.store(stored["fragment_id"], original, model_name)
+        if fragment_id is not None:
+            fragment = get_fragment_by_id(fragment_id)
+            if fragment is not None and fragment["text"] == original.text:
+                return self.store(fragment_id, original, model_name)
+        return self.analyze(original, model_name)
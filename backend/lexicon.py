@@ -0,0 +1,333 @@
+"""
+Lexicon lookups behind WordPreprocessor's features: age of acquisition, concreteness and
+unigram counts by word and by lemma.
+
+Lookups return the raw stored value, or None for words the lexicon does not contain.
+When a table has several rows for the same key, the first one (lowest rowid) wins,
+which is what the original per-word `SELECT ... WHERE word = ?` queries returned.
+
+The lexicon can also be compiled into one memory-mapped file that every worker process
+shares through the page cache (from the backend directory):
+    python lexicon.py build [--db word_information.db] [--out lexicon.bin]
+"""
+import argparse
+import bisect
+import json
+import mmap
+import sqlite3
+import struct
+import sys
+import numpy as np
+
+LEXICON_DB_PATH = "word_information.db"
+LEXICON_FILE_PATH = "lexicon.bin"
+# Upper bound on the keys InMemoryLexicon keeps per index; keys beyond it fall back to
+# SQLite. None keeps whole tables (about 290k keys, a few tens of MiB).
+IN_MEMORY_LEXICON_MAX_ENTRIES = None
+
+# (index name, table, key column, value column)
+LEXICON_INDEXES = (
+    ("age_of_acquisition", "age_of_acquisition", "word", "rating_mean"),
+    ("concreteness", "concreteness", "word", "conc_mean"),
+    ("unilem_count", "unigram_count", "lemma", "frequency"),
+    ("unigram_count", "unigram_count", "word", "frequency"),
+)
+
+_MISSING = object()
+
+LEXICON_FILE_MAGIC = b"LEXICON1"
+# magic, key count, offset of each section: key offsets, columns, key bytes, raw values
+_FILE_HEADER = struct.Struct("<8sQQQQQ")
+# Column dtypes of the compiled file. Ratings stay float64 so features are bit-identical
+# to SQLite; missing keys are NaN / -1 (counts are never negative).
+LEXICON_FILE_COLUMNS = {
+    "age_of_acquisition": np.dtype("<f8"),
+    "concreteness": np.dtype("<f8"),
+    "unilem_count": np.dtype("<i8"),
+    "unigram_count": np.dtype("<i8"),
+}
+
+
+class SQLiteLexicon:
+    """
+    Reads every lookup straight from the lexicon database.
+    """
+
+    def __init__(self, db_path=LEXICON_DB_PATH):
+        self.db_path = db_path
+
+    def _get_db_conn(self):
+        return sqlite3.connect(self.db_path)
+
+    def lookup(self, word, lemma):
+        """
+        Returns the (age_of_acquisition, concreteness, unilem_count, unigram_count)
+        values for a lowercased word and its lemma.
+        """
+        with self._get_db_conn() as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT
+                    (SELECT rating_mean FROM age_of_acquisition WHERE word = :word),
+                    (SELECT conc_mean FROM concreteness WHERE word = :word),
+                    (SELECT frequency FROM unigram_count WHERE lemma = :lemma),
+                    (SELECT frequency FROM unigram_count WHERE word = :word)
+                """,
+                {"word": word, "lemma": lemma},
+            )
+            return c.fetchone()
+
+    def lookup_many(self, lemmas):
+        """
+        Returns {word: lookup(word, lemma)} for a {word: lemma} dict, with one set-based query.
+        """
+        with self._get_db_conn() as conn:
+            c = conn.cursor()
+            c.execute("CREATE TEMP TABLE lexicon_keys (word TEXT, lemma TEXT)")
+            c.executemany("INSERT INTO lexicon_keys VALUES (?, ?)", lemmas.items())
+            # Each scalar subquery is the single-key lookup with its implicit LIMIT 1.
+            c.execute(
+                """
+                SELECT k.word,
+                    (SELECT rating_mean FROM age_of_acquisition WHERE word = k.word),
+                    (SELECT conc_mean FROM concreteness WHERE word = k.word),
+                    (SELECT frequency FROM unigram_count WHERE lemma = k.lemma),
+                    (SELECT frequency FROM unigram_count WHERE word = k.word)
+                FROM lexicon_keys k
+                """
+            )
+            values = {row[0]: row[1:] for row in c.fetchall()}
+            c.execute("DROP TABLE lexicon_keys")
+        return values
+
+    def stats(self):
+        return {"backend": "sqlite", "db_path": self.db_path}
+
+
+class InMemoryLexicon:
+    """
+    Loads the lexicon tables into dicts once, for O(1) lookups without touching SQLite.
+    With max_entries set, each index keeps only its first max_entries keys in table
+    order (the unigram table is sorted by frequency, so these are the most common words)
+    and looks the rest up in SQLite.
+    """
+
+    def __init__(self, db_path=LEXICON_DB_PATH, max_entries=IN_MEMORY_LEXICON_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._fallback = SQLiteLexicon(db_path)
+        self._indexes = {}
+        self._complete = {}
+        conn = sqlite3.connect(db_path)
+        for name, table, key, value in LEXICON_INDEXES:
+            self._indexes[name], self._complete[name] = self._load_index(conn, table, key, value)
+        conn.close()
+        self.fallback_lookups = 0
+
+    def _load_index(self, conn, table, key, value):
+        index = {}
+        for k, v in conn.execute(f"SELECT {key}, {value} FROM {table} ORDER BY rowid"):
+            if k in index:
+                continue
+            if self.max_entries is not None and len(index) >= self.max_entries:
+                return index, False
+            index[k] = v
+        return index, True
+
+    def _get(self, name, key):
+        value = self._indexes[name].get(key)
+        if value is None and not self._complete[name]:
+            return _MISSING
+        return value
+
+    def lookup(self, word, lemma):
+        values = (
+            self._get("age_of_acquisition", word),
+            self._get("concreteness", word),
+            self._get("unilem_count", lemma),
+            self._get("unigram_count", word),
+        )
+        if _MISSING in values:
+            self.fallback_lookups += 1
+            return self._fallback.lookup(word, lemma)
+        return values
+
+    def lookup_many(self, lemmas):
+        return {word: self.lookup(word, lemma) for word, lemma in lemmas.items()}
+
+    def memory_bytes(self):
+        """
+        Approximate size of the loaded indexes: the dicts plus their keys and values.
+        """
+        total = 0
+        for index in self._indexes.values():
+            total += sys.getsizeof(index)
+            total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in index.items())
+        return total
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "db_path": self.db_path,
+            "max_entries": self.max_entries,
+            "entries": {name: len(index) for name, index in self._indexes.items()},
+            "complete": dict(self._complete),
+            "memory_bytes": self.memory_bytes(),
+            "fallback_lookups": self.fallback_lookups,
+        }
+
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def build_lexicon_file(db_path=LEXICON_DB_PATH, out_path=LEXICON_FILE_PATH):
+    """
+    Compiles the lexicon tables into the file MappedLexicon reads: a sorted table of
+    every key (words and lemmas, UTF-8) plus one aligned value column per index.
+    Values that do not fit their column (such as the "NA" ratings) are kept verbatim
+    in a small JSON section so lookups still return exactly what SQLite stores.
+    """
+    indexes = InMemoryLexicon(db_path)._indexes
+    keys = sorted({k.encode("utf-8") for index in indexes.values() for k in index})
+    positions = {key.decode("utf-8"): i for i, key in enumerate(keys)}
+
+    offsets = np.zeros(len(keys) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(key) for key in keys])
+    columns = {}
+    raw_values = {}
+    for name, dtype in LEXICON_FILE_COLUMNS.items():
+        missing = np.nan if dtype.kind == "f" else -1
+        column = np.full(len(keys), missing, dtype=dtype)
+        for key, value in indexes[name].items():
+            fits = isinstance(value, (int, float) if dtype.kind == "f" else int)
+            if fits:
+                column[positions[key]] = value
+            else:
+                raw_values.setdefault(name, {})[key] = value
+        columns[name] = column
+
+    offsets_at = _align(_FILE_HEADER.size)
+    columns_at = _align(offsets_at + offsets.nbytes)
+    keys_at = columns_at + sum(column.nbytes for column in columns.values())
+    raw_at = keys_at + int(offsets[-1])
+    with open(out_path, "wb") as f:
+        f.write(_FILE_HEADER.pack(LEXICON_FILE_MAGIC, len(keys), offsets_at, columns_at, keys_at, raw_at))
+        f.write(b"\0" * (offsets_at - _FILE_HEADER.size))
+        f.write(offsets.tobytes())
+        f.write(b"\0" * (columns_at - offsets_at - offsets.nbytes))
+        for column in columns.values():
+            f.write(column.tobytes())
+        f.write(b"".join(keys))
+        f.write(json.dumps(raw_values).encode("utf-8"))
+    return len(keys)
+
+
+class _KeyTable:
+    """
+    Sequence view of the sorted key table, decoded lazily for bisect.
+    """
+
+    def __init__(self, buffer, offsets, start):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._start = start
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._buffer[self._start + int(self._offsets[i]):self._start + int(self._offsets[i + 1])]
+
+
+class MappedLexicon:
+    """
+    Reads the file written by build_lexicon_file through mmap, so worker processes
+    share a single page-cache copy and opening it costs no parsing. Keys are found
+    by binary search over the sorted key table.
+    """
+
+    def __init__(self, path=LEXICON_FILE_PATH):
+        self.path = path
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"Lexicon file {path} not found. Build it with `python lexicon.py build`."
+            ) from None
+        with f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_keys, offsets_at, columns_at, keys_at, raw_at = _FILE_HEADER.unpack_from(self._buffer)
+        if magic != LEXICON_FILE_MAGIC:
+            raise ValueError(f"{path} is not a lexicon file.")
+        offsets = np.frombuffer(self._buffer, dtype="<u8", count=n_keys + 1, offset=offsets_at)
+        self._keys = _KeyTable(self._buffer, offsets, keys_at)
+        self._columns = {}
+        for name, dtype in LEXICON_FILE_COLUMNS.items():
+            self._columns[name] = np.frombuffer(self._buffer, dtype=dtype, count=n_keys, offset=columns_at)
+            columns_at += n_keys * dtype.itemsize
+        self._raw_values = json.loads(self._buffer[raw_at:])
+
+    def _position(self, key):
+        encoded = key.encode("utf-8")
+        i = bisect.bisect_left(self._keys, encoded)
+        if i < len(self._keys) and self._keys[i] == encoded:
+            return i
+        return None
+
+    def _get(self, name, key, position):
+        raw = self._raw_values.get(name)
+        if raw is not None and key in raw:
+            return raw[key]
+        if position is None:
+            return None
+        value = self._columns[name][position]
+        if self._columns[name].dtype.kind == "f":
+            return None if np.isnan(value) else float(value)
+        return None if value < 0 else int(value)
+
+    def lookup(self, word, lemma):
+        word_position = self._position(word)
+        lemma_position = word_position if lemma == word else self._position(lemma)
+        return (
+            self._get("age_of_acquisition", word, word_position),
+            self._get("concreteness", word, word_position),
+            self._get("unilem_count", lemma, lemma_position),
+            self._get("unigram_count", word, word_position),
+        )
+
+    def lookup_many(self, lemmas):
+        return {word: self.lookup(word, lemma) for word, lemma in lemmas.items()}
+
+    def stats(self):
+        return {
+            "backend": "mmap",
+            "path": self.path,
+            "keys": len(self._keys),
+            "file_bytes": len(self._buffer),
+        }
+
+
+LEXICON_BACKENDS = {
+    "sqlite": SQLiteLexicon,
+    "memory": InMemoryLexicon,
+    "mmap": MappedLexicon,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile the lexicon tables into a memory-mapped file.")
+    build.add_argument("--db", default=LEXICON_DB_PATH)
+    build.add_argument("--out", default=LEXICON_FILE_PATH)
+    args = parser.parse_args()
+
+    n_keys = build_lexicon_file(args.db, args.out)
+    print(f"Wrote {n_keys} keys to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
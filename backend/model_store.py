@@ -0,0 +1,204 @@
+"""
+Versioned storage for the trained word-complexity models.
+
+Artifacts live in MODEL_STORE_DIR/<fingerprint>/, where the fingerprint hashes the
+training data, the lexicon the features are read from, the feature definition and the
+model definitions. The server loads
+them at startup and only retrains when no artifacts match the current fingerprint.
+
+Usage (from the backend directory):
+    python model_store.py train [--force]
+    python model_store.py status
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+import sklearn
+
+MODEL_STORE_DIR = "models"
+MODEL_FILENAME_TEMPLATE = "model_{}.pickle"
+MANIFEST_FILENAME = "manifest.json"
+
+# Bump FEATURE_VERSION whenever WordPreprocessor.get_feature_vector changes meaning.
+FEATURE_NAMES = ("lemma_length", "age_of_acquisition", "concreteness", "unilem_count", "unigram_count")
+FEATURE_VERSION = 1
+
+
+def _hash_file(digest, path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def model_fingerprint(train_csv, lexicon_path, models):
+    """
+    Returns a short hash identifying the artifacts trained from train_csv and the lexicon
+    at lexicon_path with the given (unfitted) models, the current feature definition and
+    scikit-learn version.
+    """
+    digest = hashlib.sha256()
+    _hash_file(digest, train_csv)
+    _hash_file(digest, lexicon_path)
+    spec = {
+        "features": FEATURE_NAMES,
+        "feature_version": FEATURE_VERSION,
+        "models": {name: repr(model) for name, model in sorted(models.items())},
+        "sklearn": sklearn.__version__,
+    }
+    digest.update(json.dumps(spec, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ModelStore:
+    def __init__(self, root=MODEL_STORE_DIR):
+        self.root = root
+
+    def _dir(self, fingerprint):
+        return os.path.join(self.root, fingerprint)
+
+    def model_path(self, fingerprint, name):
+        return os.path.join(self._dir(fingerprint), MODEL_FILENAME_TEMPLATE.format(name))
+
+    def manifest(self, fingerprint):
+        """
+        Returns the manifest of the given artifact version, or None if it was never saved.
+        """
+        path = os.path.join(self._dir(fingerprint), MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def has(self, fingerprint, names):
+        manifest = self.manifest(fingerprint)
+        if manifest is None:
+            return False
+        return all(
+            name in manifest["scores"] and os.path.exists(self.model_path(fingerprint, name))
+            for name in names
+        )
+
+    def load(self, fingerprint, name):
+        with open(self.model_path(fingerprint, name), "rb") as f:
+            return pickle.load(f)
+
+    def save(self, fingerprint, models, scores, train_csv):
+        """
+        Pickles the fitted models and writes the manifest last, so a partially written
+        version is never picked up.
+        """
+        os.makedirs(self._dir(fingerprint), exist_ok=True)
+        for name, model in models.items():
+            with open(self.model_path(fingerprint, name), "wb") as f:
+                pickle.dump(model, f)
+        manifest = {
+            "fingerprint": fingerprint,
+            # Changes on every save, even a forced retrain under the same fingerprint.
+            "artifact_id": uuid.uuid4().hex[:12],
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "train_csv": train_csv,
+            "features": list(FEATURE_NAMES),
+            "feature_version": FEATURE_VERSION,
+            "sklearn": sklearn.__version__,
+            "scores": {name: float(score) for name, score in scores.items()},
+        }
+        with open(os.path.join(self._dir(fingerprint), MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            (m for m in (self.manifest(d) for d in os.listdir(self.root)) if m is not None),
+            key=lambda m: m["created_at"],
+        )
+
+
+class LazyModels(Mapping):
+    """
+    The fitted models of one stored version, unpickled on first access. Behaves like the
+    plain {name: model} dict the predictor used to hold, so callers can keep doing
+    `name in models` and `models[name]`.
+    """
+
+    def __init__(self, store, fingerprint, names, log=print):
+        self.store = store
+        self.fingerprint = fingerprint
+        self.names = tuple(names)
+        self._log = log
+        self._loaded = {}
+        self._load_stats = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        model = self._loaded.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._loaded:
+                start = time.perf_counter()
+                self._loaded[name] = self.store.load(self.fingerprint, name)
+                self._load_stats[name] = {
+                    "load_seconds": round(time.perf_counter() - start, 3),
+                    # The pickle is almost entirely the estimator's fitted arrays,
+                    # so its size is a close, cheap proxy for resident memory.
+                    "memory_bytes": os.path.getsize(self.store.model_path(self.fingerprint, name)),
+                }
+                self._log(f"Loaded {name} model in {self._load_stats[name]['load_seconds']}s")
+            return self._loaded[name]
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def preload(self, names):
+        for name in names:
+            self[name]
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def stats(self):
+        return {
+            "version": self.fingerprint,
+            "available": list(self.names),
+            "loaded": {name: dict(stats) for name, stats in self._load_stats.items()},
+            "loaded_memory_bytes": sum(s["memory_bytes"] for s in self._load_stats.values()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train the models unless current artifacts exist.")
+    train.add_argument("--force", action="store_true", help="Retrain even if artifacts exist.")
+    commands.add_parser("status", help="List stored artifact versions.")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        from predictor import WordComplexityPredictor
+
+        start = time.perf_counter()
+        predictor = WordComplexityPredictor(debug=True, retrain=args.force)
+        print(f"Models {predictor.model_version} ready in {time.perf_counter() - start:.2f}s")
+    else:
+        for manifest in ModelStore().versions():
+            scores = ", ".join(f"{k}={v:.4f}" for k, v in manifest["scores"].items())
+            print(f"{manifest['fingerprint']}  {manifest['created_at']}  RMSE: {scores}")
+
+
+if __name__ == "__main__":
+    main()
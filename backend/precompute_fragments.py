@@ -0,0 +1,49 @@
+"""
+Precomputes the text-only part of the reading assessment (tokens, word complexities,
+readability metrics) for book fragments and stores it in book.db, so a reading of a
+fragment only does the audio-dependent work.
+
+New books are analysed by db/book_in_db.py; use this to backfill existing books, or
+after the complexity models were retrained (from the backend directory):
+    python precompute_fragments.py [--book-id N] [--force]
+"""
+import argparse
+import time
+from db.help import get_fragments, get_fragment_analysis
+from predictor import BEST_MODEL_NAME, WordComplexityPredictor
+from analyzed_text import AnalyzedText
+from fragment_analysis import FragmentAnalyzer, fragment_text_hash
+
+
+def precompute_fragment_analyses(fragments, model_name=BEST_MODEL_NAME, force=False, analyzer=None):
+    """
+    Stores the analysis of each {"fragment_id", "text"} fragment that does not have a
+    current one yet. Returns the number of fragments analysed.
+    """
+    if analyzer is None:
+        # Only the complexity models are loaded; Whisper stays unloaded.
+        analyzer = FragmentAnalyzer(WordComplexityPredictor(preload_models=(model_name,)))
+    analysed = 0
+    for fragment in fragments:
+        stored = get_fragment_analysis(fragment["fragment_id"])
+        if not force and analyzer.is_current(stored, fragment_text_hash(fragment["text"]), model_name):
+            continue
+        analyzer.store(fragment["fragment_id"], AnalyzedText(fragment["text"]), model_name)
+        analysed += 1
+    return analysed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--book-id", type=int, default=None, help="Only this book (default: all books).")
+    parser.add_argument("--force", action="store_true", help="Recompute analyses that are still current.")
+    args = parser.parse_args()
+
+    fragments = get_fragments(args.book_id)
+    start = time.perf_counter()
+    analysed = precompute_fragment_analyses(fragments, force=args.force)
+    print(f"Analysed {analysed} of {len(fragments)} fragments in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
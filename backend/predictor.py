@@ -1,5 +1,5 @@
-import whisper
-import pickle
+import time
+from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split, cross_val_score
@@ -10,66 +10,257 @@ from sklearn.svm import SVR
 from sklearn.metrics import mean_squared_error
 from pydub import AudioSegment
 from preprocessor import WordPreprocessor
-import Levenshtein as lev
+from lexicon import LEXICON_BACKENDS
+from model_store import LazyModels, ModelStore, model_fingerprint
+from whisper_registry import WHISPER_REGISTRY, DEFAULT_WHISPER_MODEL
+from audio_decode import decode_audio_file, decode_base64_audio, pcm16_to_float32
+from transcription_scheduler import get_scheduler
+from transcription_cache import TRANSCRIPTION_CACHE, transcription_cache_key
+from complexity_cache import COMPLEXITY_CACHE, complexity_cache_key
 import re
-import textstat
-import base64
-import os
-import nltk
-from nltk.metrics import distance
+from readability import readability_metrics, readability_metrics_many
+from analyzed_text import AnalyzedText
+from alignment import MATCH, SUBSTITUTE, INSERT, align, character_distance, match_keywords, word_ops
 
 # Constants for file paths and settings
-MODEL_FILENAME_TEMPLATE = "model_{}.pickle"
 TRAINING_CSV_FILENAME = "data/training_data.csv"
+# Where word features are looked up, one of LEXICON_BACKENDS. "memory" loads the
+# lexicon tables once per process instead of querying SQLite for every word; with
+# several worker processes, "mmap" shares one copy built by `python lexicon.py build`.
+LEXICON_BACKEND = "memory"
+# Complexity model the server scores words with.
+BEST_MODEL_NAME = "random_forest"
+# Complexity models loaded at startup; the others are loaded on first use.
+PRELOADED_MODELS = (BEST_MODEL_NAME,)
+# Speech recognition backend, one of ASR_BACKENDS. Our servers are CPU-only,
+# where "whisper-int8" trades a little accuracy for much lower latency.
+ASR_BACKEND = "whisper"
+# Whisper word probabilities below this are reported as low confidence.
+LOW_CONFIDENCE_PROBABILITY = 0.5
+
+
+def transcript_words(result):
+    """
+    Flattens the per-segment word timings of a Whisper result into one list of
+    {"word", "start", "end", "probability"} dictionaries.
+    """
+    return [
+        {
+            "word": word["word"].strip(),
+            "start": float(word["start"]),
+            "end": float(word["end"]),
+            "probability": float(word["probability"]),
+        }
+        for segment in result.get("segments", [])
+        for word in segment.get("words", [])
+    ]
+
+
+class ASRBackend(ABC):
+    """
+    Interface for the speech recognition backends used by the predictor.
+    Implementations transcribe 16 kHz mono float32 samples and return
+    Whisper-style result dictionaries with at least a "text" key.
+    """
+
+    name = None
+
+    def __init__(self, model_size=DEFAULT_WHISPER_MODEL):
+        self.model_size = model_size
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.model_size}"
+
+    @abstractmethod
+    def transcribe(self, audio, **options):
+        """
+        Transcribes 16 kHz mono float32 samples into a Whisper-style result dictionary.
+        """
+
+    def shared_model(self):
+        """
+        Returns the LoadedWhisperModel behind this backend, used for micro-batching
+        and streaming, or None when the backend cannot provide one.
+        """
+        return None
+
+    def warm_up(self):
+        pass
+
+
+class WhisperBackend(ASRBackend):
+    """
+    The openai-whisper checkpoint as published, in fp32 (fp16 on GPU).
+    """
+
+    name = "whisper"
+    quantized = False
+
+    def shared_model(self):
+        return WHISPER_REGISTRY.get(self.model_size, quantized=self.quantized)
+
+    def transcribe(self, audio, **options):
+        return self.shared_model().transcribe(audio, **options)
+
+    def warm_up(self):
+        self.shared_model()
+
+
+class QuantizedWhisperBackend(WhisperBackend):
+    """
+    The same Whisper checkpoint with its Linear layers dynamically quantized to int8 on CPU.
+    """
+
+    name = "whisper-int8"
+    quantized = True
+
+
+ASR_BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    QuantizedWhisperBackend.name: QuantizedWhisperBackend,
+}
+
+
+def build_models():
+    """
+    Returns the unfitted word-complexity models, keyed by name.
+    """
+    return {
+        "decision_tree": DecisionTreeRegressor(max_depth=4),
+        "linear_regression": LinearRegression(),
+        "random_forest": RandomForestRegressor(n_estimators=100),
+        "gradient_boosting": GradientBoostingRegressor(n_estimators=100),
+        "svr": SVR(),
+    }
+
 
 class WordComplexityPredictor:
-    def __init__(self, debug=False):
-        self._preprocessor = WordPreprocessor()
+    def __init__(
+        self,
+        debug=False,
+        whisper_model=DEFAULT_WHISPER_MODEL,
+        batch_transcription=True,
+        batch_options=None,
+        asr_backend=ASR_BACKEND,
+        retrain=False,
+        preload_models=PRELOADED_MODELS,
+        lexicon_backend=LEXICON_BACKEND,
+    ):
+        if asr_backend not in ASR_BACKENDS:
+            raise ValueError(f"ASR backend {asr_backend} not found.")
+        if lexicon_backend not in LEXICON_BACKENDS:
+            raise ValueError(f"Lexicon backend {lexicon_backend} not found.")
+        self._preprocessor = WordPreprocessor(lexicon=LEXICON_BACKENDS[lexicon_backend]())
         self._debug = debug
+        self.asr = ASR_BACKENDS[asr_backend](whisper_model)
+        self.batch_transcription = batch_transcription
+        # max_batch_size, window_ms and queue_depth of the transcription scheduler.
+        self.batch_options = batch_options or {}
         self.transcription = None
-        self.models = {
-            "decision_tree": DecisionTreeRegressor(max_depth=4),
-            "linear_regression": LinearRegression(),
-            "random_forest": RandomForestRegressor(n_estimators=100),
-            "gradient_boosting": GradientBoostingRegressor(n_estimators=100),
-            "svr": SVR(),
-        }
-        self.model_scores = {}
-        self._train_and_save_models(TRAINING_CSV_FILENAME)
+        self.model_store = ModelStore()
+        model_specs = build_models()
+        self.model_version = model_fingerprint(
+            TRAINING_CSV_FILENAME, self._preprocessor.db_path, model_specs
+        )
 
-    def _train_and_save_models(self, train_csv):
+        start = time.perf_counter()
+        if retrain or not self.model_store.has(self.model_version, model_specs):
+            self._train_and_save_models(TRAINING_CSV_FILENAME, model_specs)
+            action = "Trained"
+        else:
+            action = "Loaded"
+        manifest = self.model_store.manifest(self.model_version)
+        self.model_scores = manifest["scores"]
+        # Identifies the stored artifacts themselves, for caches of their predictions.
+        self.model_artifact_id = f"{self.model_version}-{manifest.get('artifact_id', '')}"
+        self.models = LazyModels(self.model_store, self.model_version, model_specs, log=self._log)
+        self.models.preload(preload_models)
+        self.startup_seconds = time.perf_counter() - start
+        print(f"{action} complexity models {self.model_version} in {self.startup_seconds:.2f}s")
+
+    def model_stats(self):
+        stats = self.models.stats()
+        stats["rmse"] = self.model_scores
+        stats["lexicon"] = self._preprocessor.lexicon.stats()
+        return stats
+
+    def _train_and_save_models(self, train_csv, models):
         training_data = pd.read_csv(train_csv)
-        X = np.vstack(
-            [
-                self._preprocessor.get_feature_vector(row["word"])
-                for _, row in training_data.iterrows()
-            ]
-        )
+        X = self._preprocessor.get_feature_matrix(training_data["word"])
         y = np.array(training_data["label"])
 
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42
         )
 
-        for name, model in self.models.items():
+        scores = {}
+        for name, model in models.items():
             model.fit(X_train, y_train)
             predictions = model.predict(X_test)
             mse = mean_squared_error(y_test, predictions)
-            self.model_scores[name] = np.sqrt(mse)
-            with open(MODEL_FILENAME_TEMPLATE.format(name), "wb") as f:
-                pickle.dump(model, f)
+            scores[name] = np.sqrt(mse)
             self._log(
-                f"Trained and saved {name} model with RMSE: {self.model_scores[name]}"
+                f"Trained {name} model with RMSE: {scores[name]}"
             )
+        self.model_store.save(self.model_version, models, scores, train_csv)
+        self._log(f"Saved models to {self.model_store.root}/{self.model_version}")
 
     def predict(self, word, model_name="decision_tree"):
+        return self.predict_many([word], model_name=model_name)[word.lower()]
+
+    def predict_many(self, words, model_name="decision_tree"):
+        """
+        Predicts the complexity of every distinct word with a single model call.
+        Scores are memoized in COMPLEXITY_CACHE per model name and stored artifact.
+
+        Args:
+        - words (list): Words to score, in any case; duplicates are scored once.
+        - model_name (str): Name of the model to use.
+
+        Returns:
+        - dict: Lowercased word to complexity, in order of first occurrence.
+        """
         if model_name not in self.models:
             raise ValueError(f"Model {model_name} not found.")
-        model = self.models[model_name]
-        features = self._preprocessor.get_feature_vector(word)
-        pred = model.predict(features)[0]
-        self._log(f'Predicted "{word}" with complexity {pred} using {model_name}.')
-        return float(pred)
+        unique_words = list(dict.fromkeys(word.lower() for word in words))
+        if not unique_words:
+            return {}
+        keys = {
+            word: complexity_cache_key(word, model_name, self.model_artifact_id)
+            for word in unique_words
+        }
+        scores = COMPLEXITY_CACHE.get_many(list(keys.values()))
+        to_score = [word for word in unique_words if keys[word] not in scores]
+        if to_score:
+            model = self.models[model_name]
+            features = self._preprocessor.get_feature_matrix(to_score)
+            predictions = model.predict(features)
+            new_scores = {keys[word]: float(pred) for word, pred in zip(to_score, predictions)}
+            COMPLEXITY_CACHE.put_many(new_scores)
+            scores.update(new_scores)
+            self._log(f"Predicted {len(to_score)} words using {model_name}.")
+        return {word: scores[keys[word]] for word in unique_words}
+
+    def warm_up_asr(self):
+        """
+        Loads the ASR model used by this predictor so the first request does not pay for it.
+        """
+        self.asr.warm_up()
+
+    def _transcribe(self, audio):
+        """
+        Transcribes 16 kHz float32 samples, through the micro-batching scheduler when enabled.
+        Repeated uploads of the same recording are served from TRANSCRIPTION_CACHE.
+        """
+        shared_model = self.asr.shared_model() if self.batch_transcription else None
+        options = {"batched": shared_model is not None, "word_timestamps": True}
+        key = transcription_cache_key(audio, self.asr.key, options)
+        if shared_model is not None:
+            compute = lambda: get_scheduler(shared_model, **self.batch_options).transcribe(audio)
+        else:
+            compute = lambda: self.asr.transcribe(audio, word_timestamps=True)
+        return TRANSCRIPTION_CACHE.get_or_compute(key, compute)
 
     def _log(self, message):
         if self._debug:
@@ -81,74 +272,136 @@ class WordComplexityPredictor:
         audio.export(wav_file_path, format="wav")
         self._log(f"Converted {mp3_file_path} to {wav_file_path}.")
 
-    def process_base64_audio(self, base64_audio, temp_filename="temp_audio.wav"):
-        # Decode the base64 string
-        audio_data = base64.b64decode(base64_audio)
-
-        # Write the MP4 audio to a temporary file
-        with open(temp_filename, "wb") as f:
-            f.write(audio_data)
+    def transcribe_base64_audio(self, base64_audio):
+        """
+        Transcribes a base64-encoded recording in one decode pass.
 
-        # Convert MP4 to WAV using pydub (requires ffmpeg)
-        audio = AudioSegment.from_file(temp_filename)
-        audio.export(temp_filename, format="wav")
+        Returns:
+        - dict: "text", the full transcription, and "words", the timed words
+          as returned by transcript_words.
+        """
+        # Decode the upload straight to 16 kHz float32 samples, without temp files
+        audio = decode_base64_audio(base64_audio)
 
-        # Process the WAV file with Whisper
-        model = whisper.load_model("base")
-        result = model.transcribe(temp_filename)
+        # Process the samples with the shared Whisper model
+        result = self._transcribe(audio)
         print(f"Transcribed audio to text: {result['text']}")
 
-        # Cleanup: Remove the temporary files
-        os.remove(temp_filename)
+        return {"text": result["text"], "words": transcript_words(result)}
 
-        return result["text"]
+    def process_base64_audio(self, base64_audio):
+        return self.transcribe_base64_audio(base64_audio)["text"]
 
     # New Method: Transcribe Audio to Text
     def transcribe_audio(self, audio_file_path):
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_file_path)
+        result = self._transcribe(decode_audio_file(audio_file_path))
         self._log(f"Transcribed audio to text: {result['text']}")
         self.transcription = result["text"]
         return result["text"]
 
     def transcribe_audio_stream(self, audio_stream):
-        # Load the Whisper model
-        model = whisper.load_model("base")
-
         # Read the audio stream into a byte array
         audio_bytes = audio_stream.read()
 
-        # Convert the byte array to a NumPy array.
-        # The audio file needs to be in a format Whisper understands (e.g., WAV).
-        # If it's not in a compatible format, you might need additional steps to convert it.
-        # For this example, assuming the audio is already in a compatible format (PCM 16-bit):
-        audio_np = np.frombuffer(audio_bytes, dtype=np.int16)
-
-        # Whisper expects the audio to be in float32 format, normalized between -1 and 1.
-        # This conversion step is necessary if the audio was in int16 format.
-        audio_np = audio_np.astype(np.float32) / 32768.0
-
-        # Reshape the audio array to (-1, 1) if it's mono or (-1, 2) for stereo, as needed by Whisper.
-        # Assuming mono audio for this example:
-        audio_np = audio_np.reshape(-1, 1)
+        # The stream is expected to be raw 16-bit PCM at 16 kHz; Whisper wants
+        # a 1-D float32 array normalized between -1 and 1.
+        audio_np = pcm16_to_float32(audio_bytes)
 
         # Transcribe the audio
-        result = model.transcribe(audio_np)
+        result = self._transcribe(audio_np)
         self._log(f"Transcribed audio to text: {result['text']}")
         self.transcription = result["text"]
         return result["text"]
 
     def calculate_levenshtein_distance(self, original_text, transcribed_text):
-        return distance.edit_distance(original_text, transcribed_text)
+        return character_distance(original_text, transcribed_text)
+
+    def align(self, original_text, transcribed_text, original_words=None, heard_words=None):
+        """
+        Character distance, normalized distance and word-level operations in one call,
+        see alignment.align.
+        """
+        return align(original_text, transcribed_text, original_words, heard_words)
 
     def keyword_analysis(self, original_text, transcribed_text):
-        original_keywords = set(
-            nltk.word_tokenize(original_text.lower())
-        )  # Tokenize and convert to lowercase
-        transcribed_keywords = set(nltk.word_tokenize(transcribed_text.lower()))
-        missed_keywords = original_keywords.difference(transcribed_keywords)
-        new_keywords = transcribed_keywords.difference(original_keywords)
-        return list(missed_keywords), list(new_keywords)
+        """
+        Missed and new words of two texts, given as str or AnalyzedText, compared in
+        the normalized form the alignment uses.
+        """
+        if not isinstance(original_text, AnalyzedText):
+            original_text = AnalyzedText(original_text)
+        if not isinstance(transcribed_text, AnalyzedText):
+            transcribed_text = AnalyzedText(transcribed_text)
+        original_words = original_text.normalized_words
+        transcribed_words = transcribed_text.normalized_words
+        missed_keywords = set(original_words).difference(transcribed_words)
+        new_keywords = set(transcribed_words).difference(original_words)
+        # Near misses read in place of a word, such as "play"/"played", are not counted
+        for match in self.match_keywords(original_words, transcribed_words):
+            missed_keywords.discard(match.original)
+            new_keywords.discard(match.heard)
+        return sorted(missed_keywords), sorted(new_keywords)
+
+    def match_keywords(self, original_words, heard_words, ops=None):
+        """
+        Near misses among the substituted words, see alignment.match_keywords.
+        """
+        return match_keywords(original_words, heard_words, ops)
+
+    def word_analysis(self, original_words, heard_words, ops=None, keyword_matches=()):
+        """
+        Aligns the words of the displayed text with the timed words Whisper heard.
+
+        Args:
+        - original_words (list): Normalized words of the displayed text.
+        - heard_words (list): Timed words with the same normalization, as from transcript_words.
+        - ops (list): The word_ops of the two word lists, if the caller already aligned them.
+        - keyword_matches (list): KeywordMatch of the substitutions that count as read.
+
+        Returns:
+        - tuple: (missed_keywords, new_keywords, word_segments), where word_segments has one
+          entry per original word with its status ("correct", "low_confidence" or "missed")
+          and, when it was heard, its start, end and probability. Near misses also name
+          the word heard in their place under "heard".
+        """
+        heard = [w["word"] for w in heard_words]
+        if ops is None:
+            ops = word_ops(original_words, heard)
+        near_misses = {match.original_index: match.heard_index for match in keyword_matches}
+        word_segments = []
+        inserted = []
+        for op in ops:
+            if op.op == MATCH or near_misses.get(op.original_index, -1) == op.heard_index:
+                timed = heard_words[op.heard_index]
+                confident = timed["probability"] is None or timed["probability"] >= LOW_CONFIDENCE_PROBABILITY
+                segment = {
+                    "word": original_words[op.original_index],
+                    "status": "correct" if confident else "low_confidence",
+                    "start": timed["start"],
+                    "end": timed["end"],
+                    "probability": timed["probability"],
+                }
+                if op.op == SUBSTITUTE:
+                    segment["heard"] = heard[op.heard_index]
+                word_segments.append(segment)
+                continue
+            if op.original_index is not None:
+                word_segments.append({
+                    "word": original_words[op.original_index],
+                    "status": "missed",
+                    "start": None,
+                    "end": None,
+                    "probability": None,
+                })
+            if op.heard_index is not None:
+                inserted.append(heard[op.heard_index])
+
+        missed_keywords = list(dict.fromkeys(
+            segment["word"] for segment in word_segments if segment["status"] == "missed"
+        ))
+        original_set = set(original_words)
+        new_keywords = list(dict.fromkeys(w for w in inserted if w not in original_set))
+        return missed_keywords, new_keywords, word_segments
 
     # New Method: Process Audio File and Predict Word Complexities
     def process_audio_and_predict(self, mp3_file_path, model_name="decision_tree"):
@@ -157,15 +410,7 @@ class WordComplexityPredictor:
         wav_file_path = mp3_file_path.replace(".mp3", ".wav")
         self.convert_mp3_to_wav(mp3_file_path, wav_file_path)
         transcription = self.transcribe_audio(wav_file_path)
-        words = transcription.split()
-
-        complexities = {}
-        for word in words:
-            complexity = self.predict(word, model_name=model_name)
-            if complexity is not None:
-                complexities[word.lower()] = complexity
-
-        return complexities
+        return self.predict_many(transcription.split(), model_name=model_name)
 
     def process_audio_stream_and_predict(
         self, audio_stream, model_name="decision_tree"
@@ -173,41 +418,24 @@ class WordComplexityPredictor:
         if model_name not in self.models:
             raise ValueError(f"Model {model_name} not found.")
         transcription = self.transcribe_audio_stream(audio_stream)
-        words = transcription.split()
-
-        complexities = {}
-        for word in words:
-            complexity = self.predict(word, model_name=model_name)
-            if complexity is not None:
-                complexities[word.lower()] = complexity
-
-        return complexities
+        return self.predict_many(transcription.split(), model_name=model_name)
 
     def process_text_and_predict(self, text, model_name="decision_tree"):
         if model_name not in self.models:
             raise ValueError(f"Model {model_name} not found.")
-        words = text.split()
-        complexities = {}
-        for word in words:
-            complexity = self.predict(word, model_name=model_name)
-            if complexity is not None:
-                complexities[word.lower()] = complexity
-
-        return complexities
+        return self.predict_many(text.split(), model_name=model_name)
 
     def align_texts(self, original, transcribed):
-        ops = lev.opcodes(original, transcribed)
         difficulties = []
-
-        for op, orig_start, orig_end, trans_start, trans_end in ops:
-            if op in ["replace", "delete", "insert"]:
-                word_section = (
-                    original[orig_start:orig_end]
-                    if op != "insert"
-                    else transcribed[trans_start:trans_end]
+        for op in word_ops(original, transcribed):
+            if op.op == MATCH:
+                continue
+            if op.op == INSERT:
+                difficulties.append((transcribed[op.heard_index], "insert"))
+            else:
+                difficulties.append(
+                    (original[op.original_index], "replace" if op.op == SUBSTITUTE else "delete")
                 )
-                for word in word_section:
-                    difficulties.append((word, op))
 
         return difficulties
 
@@ -236,12 +464,17 @@ class WordComplexityPredictor:
         Returns:
         - dict: A dictionary containing the calculated readability scores.
         """
-        metrics = {
-            "Automated Readability Index": textstat.automated_readability_index(text),
-            "Coleman–Liau Index": textstat.coleman_liau_index(text),
-            "Flesch-Kincaid Grade Level": textstat.flesch_kincaid_grade(text),
-            "Flesch Reading Ease": textstat.flesch_reading_ease(text),
-            "Gunning Fog Index": textstat.gunning_fog(text),
-            "SMOG Grade": textstat.smog_index(text),
-        }
-        return metrics
+        return readability_metrics(text)
+
+    def calculate_readability_metrics_many(self, texts):
+        """
+        Calculate the readability metrics of several texts in one call.
+
+        Args:
+        - texts (list of str): The input texts.
+
+        Returns:
+        - dict: The readability scores of each distinct text, keyed by the text.
+        """
+        texts = list(dict.fromkeys(texts))
+        return dict(zip(texts, readability_metrics_many(texts)))
@@ -1,13 +1,14 @@
 import nltk
 import numpy as np
-import sqlite3
+from lexicon import LEXICON_DB_PATH, SQLiteLexicon
 
 LEMMATIZER = nltk.WordNetLemmatizer()
 
 class WordPreprocessor:
 
-    def __init__(self, db_path="word_information.db"):
+    def __init__(self, db_path=LEXICON_DB_PATH, lexicon=None):
         self.db_path = db_path
+        self.lexicon = lexicon if lexicon is not None else SQLiteLexicon(db_path)
 
     def get_feature_vector(self, word):
         """
@@ -15,43 +16,28 @@ class WordPreprocessor:
         """
         word = word.lower()
         lemma = LEMMATIZER.lemmatize(word)
-        return np.array([[
-            len(lemma),
-            self._get_age_of_acquisition(word),
-            self._get_concreteness_score(word),
-            self._get_unilem_count(lemma),
-            self._get_unigram_count(word),
-        ]])
-
-    def _get_db_conn(self):
-        return sqlite3.connect(self.db_path)
-
-    def _get_age_of_acquisition(self, word):
-        with self._get_db_conn() as conn:
-            c = conn.cursor()
-            c.execute(
-                "SELECT rating_mean FROM age_of_acquisition WHERE word = ?", (word,)
-            )
-            result = c.fetchone()
-        return float(result[0]) if result else 0
-
-    def _get_concreteness_score(self, word):
-        with self._get_db_conn() as conn:
-            c = conn.cursor()
-            c.execute("SELECT conc_mean FROM concreteness WHERE word = ?", (word,))
-            result = c.fetchone()
-        return float(result[0]) if result else 0
+        return np.array([self._feature_row(lemma, self.lexicon.lookup(word, lemma))])
 
-    def _get_unilem_count(self, lemma):
-        with self._get_db_conn() as conn:
-            c = conn.cursor()
-            c.execute("SELECT frequency FROM unigram_count WHERE lemma = ?", (lemma,))
-            result = c.fetchone()
-        return float(result[0]) if result else 0
-
-    def _get_unigram_count(self, word):
-        with self._get_db_conn() as conn:
-            c = conn.cursor()
-            c.execute("SELECT frequency FROM unigram_count WHERE word = ?", (word,))
-            result = c.fetchone()
-        return float(result[0]) if result else 0
+    def get_feature_matrix(self, words):
+        """
+        Returns the (n, 5) feature matrix for a sequence of words, identical to stacking
+        get_feature_vector for each word, but looking each distinct word up only once
+        and, on SQLite, with a single set-based query.
+        """
+        words = [word.lower() for word in words]
+        lemmas = {word: LEMMATIZER.lemmatize(word) for word in dict.fromkeys(words)}
+        if not lemmas:
+            return np.empty((0, 5))
+        lookups = self.lexicon.lookup_many(lemmas)
+        return np.array([self._feature_row(lemmas[word], lookups[word]) for word in words])
+
+    @staticmethod
+    def _feature_row(lemma, values):
+        aoa, concreteness, unilem, unigram = values
+        return [
+            len(lemma),
+            float(aoa) if aoa is not None else 0,
+            float(concreteness) if concreteness is not None else 0,
+            float(unilem) if unilem is not None else 0,
+            float(unigram) if unigram is not None else 0,
+        ]
@@ -0,0 +1,133 @@
+"""
+Readability metrics computed from one pass over the text.
+
+Each textstat function re-tokenizes the text and re-counts its words, sentences and
+syllables. Here every text is counted once, syllables are cached per word, and all six
+metrics are derived from the shared counts with the formulas and rounding of textstat
+0.7.3 (English, default settings), so the values are the same.
+"""
+import math
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from pyphen import Pyphen
+import textstat
+
+READABILITY_LANG = "en_US"
+SYLLABLE_CACHE_SIZE = 100000
+# Words with at least this many syllables that are not in the easy word list count as
+# difficult for the Gunning Fog index (textstat's English "syllable_threshold").
+FOG_SYLLABLE_THRESHOLD = 3
+
+_PYPHEN = Pyphen(lang=READABILITY_LANG)
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s")
+_SENTENCE = re.compile(r"\b[^.!?]+[.!?]*", re.UNICODE)
+_FOG_WORD = re.compile(r"[\w\='‘’]+")
+
+
+def _load_easy_words():
+    path = os.path.join(os.path.dirname(textstat.__file__), "resources", "en", "easy_words.txt")
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f}
+
+
+_EASY_WORDS = _load_easy_words()
+
+ReadabilityCounts = namedtuple(
+    "ReadabilityCounts",
+    ["characters", "letters", "words", "sentences", "syllables", "polysyllables", "difficult_words"],
+)
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def syllable_count(word):
+    """
+    Syllables of one lowercased word without punctuation, as counted by pyphen.
+    """
+    return len(_PYPHEN.positions(word)) + 1
+
+
+def _legacy_round(number, points=0):
+    # textstat's rounding: half away from zero.
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+def count_text(text):
+    """
+    Counts everything the six metrics need in one pass over the text.
+    """
+    words = _PUNCTUATION.sub("", text).split()
+    # A sentence only counts if it has more than two words.
+    sentences = [s for s in _SENTENCE.findall(text) if len(_PUNCTUATION.sub("", s).split()) > 2]
+    word_syllables = [syllable_count(word) for word in _PUNCTUATION.sub("", text.lower()).split()]
+    difficult = 0
+    for word in set(_FOG_WORD.findall(text.lower())):
+        if word in _EASY_WORDS:
+            continue
+        bare = _PUNCTUATION.sub("", word)
+        if bare and syllable_count(bare) >= FOG_SYLLABLE_THRESHOLD:
+            difficult += 1
+    return ReadabilityCounts(
+        characters=len(_WHITESPACE.sub("", text)),
+        letters=sum(len(word) for word in words),
+        words=len(words),
+        sentences=max(1, len(sentences)),
+        syllables=sum(word_syllables),
+        polysyllables=sum(1 for n in word_syllables if n >= 3),
+        difficult_words=difficult,
+    )
+
+
+def metrics_from_counts(c):
+    """
+    Returns the six readability metrics for precomputed ReadabilityCounts.
+    """
+    sentence_length = _legacy_round(c.words / c.sentences, 1)
+    syllables_per_word = _legacy_round(c.syllables / c.words, 1) if c.words else 0.0
+
+    if c.words:
+        ari = _legacy_round(
+            (4.71 * _legacy_round(c.characters / c.words, 2))
+            + (0.5 * _legacy_round(c.words / c.sentences, 2))
+            - 21.43,
+            1,
+        )
+        letters = _legacy_round(_legacy_round(c.letters / c.words, 2) * 100, 2)
+        sentences = _legacy_round(_legacy_round(c.sentences / c.words, 2) * 100, 2)
+        fog = _legacy_round(0.4 * (sentence_length + c.difficult_words / c.words * 100), 2)
+    else:
+        ari = fog = 0.0
+        letters = sentences = 0.0
+    coleman_liau = _legacy_round((0.058 * letters) - (0.296 * sentences) - 15.8, 2)
+
+    if c.sentences >= 3:
+        smog = _legacy_round((1.043 * (30 * (c.polysyllables / c.sentences)) ** 0.5) + 3.1291, 1)
+    else:
+        smog = 0.0
+
+    return {
+        "Automated Readability Index": ari,
+        "Coleman–Liau Index": coleman_liau,
+        "Flesch-Kincaid Grade Level": _legacy_round(
+            (0.39 * sentence_length) + (11.8 * syllables_per_word) - 15.59, 1
+        ),
+        "Flesch Reading Ease": _legacy_round(
+            206.835 - (1.015 * sentence_length) - (84.6 * syllables_per_word), 2
+        ),
+        "Gunning Fog Index": fog,
+        "SMOG Grade": smog,
+    }
+
+
+def readability_metrics(text):
+    return metrics_from_counts(count_text(text))
+
+
+def readability_metrics_many(texts):
+    """
+    Returns the metrics of each text, in order. Syllable counts are shared across texts.
+    """
+    return [readability_metrics(text) for text in texts]
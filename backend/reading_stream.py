@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+import uuid
+import numpy as np
+import Levenshtein as lev
+from audio_decode import SAMPLE_RATE
+from predictor import transcript_words
+from transcription_scheduler import get_scheduler
+
+# Audio after the last committed word is re-transcribed on every chunk; once it
+# grows past STREAM_WINDOW_SECONDS the words that are safely behind the live
+# edge are committed and their audio is dropped from the window.
+STREAM_WINDOW_SECONDS = 8
+STREAM_COMMIT_MARGIN_SECONDS = 1.5
+# When nothing becomes stable (silence, a hesitating child) the window is cut back to
+# STREAM_WINDOW_SECONDS once it reaches this length, so a chunk never costs more than
+# one transcription of this much audio. Kept under Whisper's 30 s window so windows
+# always take the scheduler's batched path.
+STREAM_MAX_WINDOW_SECONDS = 20
+STREAM_SESSION_TTL_SECONDS = 300
+
+
+def _normalize_words(text):
+    return re.sub(r"[^a-z0-9\s']", " ", text.lower()).split()
+
+
+def match_reading_progress(original_text, transcription):
+    """
+    Aligns what has been read so far against the displayed fragment.
+
+    Returns:
+    - dict: matched_words and missed_words of the fragment up to the furthest word the
+      child has reached, and read_up_to, the index of the next fragment word to read.
+    """
+    original = _normalize_words(original_text)
+    spoken = _normalize_words(transcription)
+    matched = []
+    skipped = []
+    read_up_to = 0
+    for op, orig_start, orig_end, _, _ in lev.opcodes(original, spoken):
+        if op == "equal":
+            matched.extend(original[orig_start:orig_end])
+            read_up_to = orig_end
+        elif op in ("replace", "delete"):
+            skipped.append((orig_start, original[orig_start:orig_end]))
+    # Words after the furthest match have not been reached yet, so they are not misses.
+    missed = [word for start, words in skipped if start < read_up_to for word in words]
+    return {"matched_words": matched, "missed_words": missed, "read_up_to": read_up_to}
+
+
+class ReadingStreamSession:
+    """
+    Incrementally transcribes one child's reading of a fragment as audio chunks arrive.
+    """
+
+    def __init__(self, displayed_text, loaded_model, fragment_id=None):
+        self.session_id = uuid.uuid4().hex
+        self.displayed_text = displayed_text
+        self.fragment_id = fragment_id
+        self._loaded = loaded_model
+        # Only the audio after the last committed word is kept.
+        self._window = np.zeros(0, dtype=np.float32)
+        self._window_offset = 0.0  # Seconds of audio before the window.
+        self._total_samples = 0
+        self._committed_words = []
+        self._window_words = []
+        self._window_text = ""
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+    @property
+    def transcription(self):
+        committed = [word["word"] for word in self._committed_words]
+        return " ".join(committed + [self._window_text]).strip()
+
+    @property
+    def words(self):
+        return self._committed_words + self._window_words
+
+    def add_chunk(self, samples):
+        """
+        Appends 16 kHz float32 samples, re-transcribes the live window and returns partial results.
+        """
+        self.last_seen = time.monotonic()
+        self._window = np.concatenate([self._window, samples])
+        self._total_samples += len(samples)
+        self._transcribe_window(commit=True)
+        progress = match_reading_progress(self.displayed_text, self.transcription)
+        progress["transcription"] = self.transcription
+        progress["audio_seconds"] = round(self._total_samples / SAMPLE_RATE, 2)
+        return progress
+
+    def finish(self):
+        """
+        Transcribes whatever is left in the live window.
+
+        Returns:
+        - dict: "text", the full transcription, and "words", its timed words with
+          times measured from the start of the stream.
+        """
+        self._transcribe_window(commit=False)
+        return {"text": self.transcription, "words": self.words}
+
+    def _transcribe_window(self, commit):
+        window = self._window
+        if len(window) == 0:
+            self._window_text = ""
+            self._window_words = []
+            return
+        # Through the scheduler, so concurrent streams and uploads share encoder
+        # passes and never use the model at the same time.
+        result = get_scheduler(self._loaded).transcribe(window)
+        words = transcript_words(result)
+        for word in words:
+            word["start"] += self._window_offset
+            word["end"] += self._window_offset
+        window_seconds = len(window) / SAMPLE_RATE
+        stable = []
+        if commit and window_seconds > STREAM_WINDOW_SECONDS:
+            stable_until = self._window_offset + window_seconds - STREAM_COMMIT_MARGIN_SECONDS
+            stable = [word for word in words if word["end"] <= stable_until]
+        if stable:
+            self._committed_words.extend(stable)
+            cut_seconds = stable[-1]["end"] - self._window_offset
+            self._window = window[int(cut_seconds * SAMPLE_RATE):]
+            self._window_offset = stable[-1]["end"]
+            self._window_words = words[len(stable):]
+            self._window_text = " ".join(word["word"] for word in self._window_words)
+        else:
+            if commit and window_seconds > STREAM_MAX_WINDOW_SECONDS:
+                # No word ends before the commit margin, so the dropped audio holds none.
+                cut_samples = len(window) - int(STREAM_WINDOW_SECONDS * SAMPLE_RATE)
+                self._window = window[cut_samples:]
+                self._window_offset += cut_samples / SAMPLE_RATE
+            self._window_words = words
+            self._window_text = result["text"].strip()
+
+
+class ReadingStreamStore:
+    """
+    Keeps the open streaming sessions of this process and expires abandoned ones.
+    """
+
+    def __init__(self, ttl_seconds=STREAM_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def open(self, displayed_text, loaded_model, fragment_id=None):
+        session = ReadingStreamSession(displayed_text, loaded_model, fragment_id)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for session_id in [sid for sid, s in self._sessions.items() if s.last_seen < cutoff]:
+            del self._sessions[session_id]
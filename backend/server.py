@@ -1,16 +1,26 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from db.help import add_result_text_record,find_text_record_by_read_part, update_text_record_by_read_part, syllables_from_existing_words, check_word_mastery, get_words_vocabulary, get_mistakes_with_words, increase_recognition
-from server_help import extract_missing_keywords_from_result, tts_to_base64, generate_feedback, split_on_hyphen, remove_digits_and_specials, clean_and_convert_numbers, process_audio_and_text
+from server_help import predictor, extract_missing_keywords_from_result, tts_to_base64, generate_feedback, split_on_hyphen, remove_digits_and_specials, clean_and_convert_numbers, process_audio_and_text, analyze_transcription, get_or_create_reference_pronunciation, incorrect_segment_indices
 from db.gpt_api import generate_word_info
-from db.help import fill_existing_words, word_exists_in_existing_words, add_mistake, get_fragment_by_id, get_first_fragment_id, get_last_fragment_id, get_random_meanings_except
-import sqlite3
+from db.connection import BOOK_DB
+from db.help import add_existing_word, word_exists_in_existing_words, get_existing_word_ids, add_mistake, get_fragment_by_id, get_first_fragment_id, get_last_fragment_id, get_random_meanings_except
+from predictor import BEST_MODEL_NAME
+from whisper_registry import WHISPER_REGISTRY
+from transcription_scheduler import TranscriptionQueueFullError, scheduler_stats
+from reading_stream import ReadingStreamStore
+from audio_decode import pcm16_to_float32
+from transcription_cache import TRANSCRIPTION_CACHE
+from complexity_cache import COMPLEXITY_CACHE
+from enrichment_queue import ENRICHMENT_QUEUE
+import base64
+import os
 from gtts import gTTS
 
 app = Flask(__name__)
 CORS(app)
 selected_book_id = 1  # Default book ID
-BEST_MODEL_NAME = "random_forest"
+reading_streams = ReadingStreamStore()
 
 @app.route("/home", methods=["GET"])
 def home():
@@ -53,25 +63,39 @@ def process_recording():
     data = request.get_json()
     audio_base64 = data["audio"]
     displayed_text = data["displayed_text"]
+    fragment_id = data.get("fragment_id")  # Lets the precomputed fragment analysis be used
 
     # Process the audio data and displayed text
-    response_data = process_audio_and_text(audio_base64, displayed_text, BEST_MODEL_NAME)
+    response_data = process_audio_and_text(
+        audio_base64, displayed_text, BEST_MODEL_NAME, fragment_id
+    )
     print("Response data:", response_data)  # Log the results
 
+    record_reading_result(displayed_text, response_data)
+    return jsonify(response_data)
+
+
+def record_reading_result(displayed_text, response_data):
     # Extract missing keywords and fill book db if any
     missed_keywords, _ = extract_missing_keywords_from_result(response_data)
     missed_keywords = remove_digits_and_specials(missed_keywords)
     print("Missed words:", missed_keywords)  # Log the results
     if missed_keywords:
-        for word in missed_keywords:
+        # All missed words are looked up at once; only new ones are added
+        known_word_ids = get_existing_word_ids(missed_keywords)
+        new_words = [word for word in missed_keywords if word not in known_word_ids]
+        for word in new_words:
             print(f"Word: {word}")
-            word_id = word_exists_in_existing_words(word)
-            if word_id == -1:
-                fill_existing_words(word)
-                if check_word_mastery(word_id) is True:
-                    continue
-                
-                add_mistake(word, word_id)
+            word_id = add_existing_word(word)
+            if check_word_mastery(word_id) is True:
+                continue
+            
+            add_mistake(word, word_id)
+        # Their meaning, IPA and syllables are generated in the background, as they
+        # are again for known words filled with an older prompt version
+        known_words = [word for word in missed_keywords if word in known_word_ids]
+        stale_words = ENRICHMENT_QUEUE.cache.stale(known_words, ENRICHMENT_QUEUE.provider.prompt_version)
+        ENRICHMENT_QUEUE.enqueue(new_words + stale_words)
 
     # Check if this text-part was already read
     existing_id = find_text_record_by_read_part(displayed_text)
@@ -79,9 +103,51 @@ def process_recording():
         update_text_record_by_read_part(displayed_text, response_data)
     else:
         add_result_text_record(displayed_text, response_data)
-    return jsonify(response_data)
 
 
+#-----------------STREAMING RECORDING-------------------
+# Chunks are base64-encoded raw 16-bit PCM, 16 kHz mono, sent while the child reads.
+@app.route("/stream/start", methods=["POST"])
+def start_reading_stream():
+    data = request.get_json()
+    displayed_text = data.get("displayed_text")
+    if not displayed_text:
+        return jsonify({"error": "displayed_text is required"}), 400
+    session = reading_streams.open(
+        displayed_text, predictor.asr.shared_model(), data.get("fragment_id")
+    )
+    return jsonify({"session_id": session.session_id})
+
+
+@app.route("/stream/<session_id>/chunk", methods=["POST"])
+def add_reading_stream_chunk(session_id):
+    session = reading_streams.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    data = request.get_json()
+    if not data or not data.get("audio"):
+        return jsonify({"error": "audio is required"}), 400
+    try:
+        samples = pcm16_to_float32(base64.b64decode(data["audio"]))
+    except ValueError:
+        return jsonify({"error": "audio must be base64-encoded 16-bit PCM"}), 400
+    with session.lock:
+        progress = session.add_chunk(samples)
+    return jsonify(progress)
+
+
+@app.route("/stream/<session_id>/finish", methods=["POST"])
+def finish_reading_stream(session_id):
+    session = reading_streams.close(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    with session.lock:
+        transcript = session.finish()
+    response_data = analyze_transcription(
+        transcript, session.displayed_text, BEST_MODEL_NAME, session.fragment_id
+    )
+    record_reading_result(session.displayed_text, response_data)
+    return jsonify(response_data)
 
 
 
@@ -99,8 +165,6 @@ def analyze_pronunciation():
         audio_base64 = data.get("audio")
         word = clean_and_convert_numbers(data.get("word"))
         print("Word:", word)
-        tts = tts_to_base64(word)
-        
 
         if not audio_base64 or not word:
             return jsonify({"error": "Missing audio or word data"}), 400
@@ -109,8 +173,10 @@ def analyze_pronunciation():
         response_data = process_audio_and_text(audio_base64, word, BEST_MODEL_NAME)
         result = response_data["levenshtein_distance"] / max(len(response_data["transcription"]), len(word))
 
-        response_data2 = process_audio_and_text(tts, word, BEST_MODEL_NAME)
-        result2 = response_data2["levenshtein_distance"] / max(len(response_data2["transcription"]), len(word))
+        # The TTS reference and its transcription are computed once per word and stored
+        reference = get_or_create_reference_pronunciation(word)
+        reference_distance = predictor.calculate_levenshtein_distance(word, reference["transcription"])
+        result2 = reference_distance / max(len(reference["transcription"]), len(word))
 
         print(f'result: {result}')
         print(f'result2: {result2}')
@@ -119,8 +185,12 @@ def analyze_pronunciation():
         if result2 < 0.3:
             print('success2')
 
-        print(f'syllables: {split_on_hyphen(syllables_from_existing_words(word))}')
-        mock_feedback = generate_feedback(split_on_hyphen(syllables_from_existing_words(word)), [])
+        segments = split_on_hyphen(syllables_from_existing_words(word))
+        print(f'syllables: {segments}')
+        incorrect = incorrect_segment_indices(
+            word, segments, response_data["word_segments"], response_data["transcription"]
+        )
+        mock_feedback = generate_feedback(segments, incorrect)
         print(f'feedback {mock_feedback}')
             
 
@@ -137,11 +207,13 @@ def analyze_pronunciation():
         #     {"segment": "ple", "status": "incorrect"}
         # ]
         
+        heard = response_data["word_segments"]
         response_data = {
-            "transcription": f"User said: {word}",
+            "transcription": f"User said: {response_data['transcription']}",
             "feedback": mock_feedback,
-            "feedback_sentence": "Nice try! You had a few small mistakes.",
-            "correct_audio": "base64_audio_placeholder",  # TODO: Add actual correct pronunciation audio
+            "feedback_sentence": "Nice try! You had a few small mistakes." if incorrect else "Great job! You said it correctly.",
+            "word_timing": heard[0] if heard else None,
+            "correct_audio": reference["audio_base64"],
             "segment_audios": {
                 "ap": "base64_audio_placeholder",
                 "ple": "base64_audio_placeholder"
@@ -188,16 +260,48 @@ def select_book():
 
 @app.route("/get-books", methods=["GET"])
 def get_books():
-    DB_PATH = "db/book.db"
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM books")
-    books = cur.fetchall()
-    conn.close()
+    books = BOOK_DB.fetchall("SELECT id, name FROM books")
     # Return as a list of dicts
     books_list = [{"book_id": row[0], "name": row[1]} for row in books]
     return jsonify({"books": books_list})
 
+#-------------------STATS-------------------
+@app.route("/stats/asr-models", methods=["GET"])
+def get_asr_model_stats():
+    stats = WHISPER_REGISTRY.stats()
+    stats["schedulers"] = scheduler_stats()
+    return jsonify(stats)
+
+
+@app.route("/stats/complexity-models", methods=["GET"])
+def get_complexity_model_stats():
+    return jsonify(predictor.model_stats())
+
+
+@app.route("/stats/complexity-cache", methods=["GET"])
+def get_complexity_cache_stats():
+    return jsonify(COMPLEXITY_CACHE.stats())
+
+
+@app.route("/stats/transcription-cache", methods=["GET"])
+def get_transcription_cache_stats():
+    return jsonify(TRANSCRIPTION_CACHE.stats())
+
+
+@app.route("/stats/word-enrichment", methods=["GET"])
+def get_word_enrichment_stats():
+    return jsonify(ENRICHMENT_QUEUE.stats())
+
+
+@app.errorhandler(TranscriptionQueueFullError)
+def transcription_queue_full(e):
+    return jsonify({"error": str(e)}), 503
+
 
 if __name__ == "__main__":
+    # With the debug reloader only the child process serves requests, so only it loads Whisper.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        predictor.warm_up_asr()
+        # Resume the word enrichment jobs left from the last run
+        ENRICHMENT_QUEUE.start()
     app.run(host="0.0.0.0", debug=True)
\ No newline at end of file
@@ -1,46 +1,64 @@
 import sqlite3
-import string
-import re
-from num2words import num2words
 from predictor import WordComplexityPredictor
+from fragment_analysis import FragmentAnalyzer
+from analyzed_text import AnalyzedText, clean_and_convert_numbers
+from db.help import get_reference_pronunciation, save_reference_pronunciation
 from gtts import gTTS
 import base64
 from io import BytesIO
+import Levenshtein as lev
 
 predictor = WordComplexityPredictor(debug=True)
+fragment_analyzer = FragmentAnalyzer(predictor)
 
 
-def process_audio_and_text(audio_base64, original_text, model_name):
-    # Assuming your transcription method can handle a stream
-    transcription = clean_and_convert_numbers(predictor.process_base64_audio(audio_base64))
+def process_audio_and_text(audio_base64, original_text, model_name, fragment_id=None):
+    # One decode pass gives both the text and the timed words
+    transcript = predictor.transcribe_base64_audio(audio_base64)
+    return analyze_transcription(transcript, original_text, model_name, fragment_id)
 
-    # Levenshtein Distance
-    lev_distance = predictor.calculate_levenshtein_distance(
-        original_text, transcription
-    )
 
-    # Keyword Analysis
-    missed_keywords, new_keywords = predictor.keyword_analysis(
-        original_text, transcription
+def analyze_transcription(transcript, original_text, model_name, fragment_id=None):
+    """
+    Runs the text-only part of the reading assessment on a transcript ({"text", "words"},
+    the timed words Whisper heard). Everything that only depends on the fragment comes
+    from its precomputed analysis.
+    """
+    original = AnalyzedText(original_text)
+    fragment = fragment_analyzer.get(original, model_name, fragment_id)
+    # The heard words give both the cleaned transcription and the timed words to align
+    if transcript["words"]:
+        heard = AnalyzedText.from_timed_words(transcript["words"])
+    else:
+        heard = AnalyzedText(transcript["text"])
+    transcription = heard.cleaned
+    heard_words = heard.normalized_timed_words
+
+    # Character distance and word alignment in one pass
+    alignment = predictor.align(
+        original.text, transcription, fragment["words"], [w["word"] for w in heard_words]
     )
+    lev_distance = alignment.distance
 
-    word_complexities = predictor.process_text_and_predict(
-        original_text, model_name=model_name
+    # Near misses read in place of a word count as read, so only true misses are
+    # recorded and enriched
+    keyword_matches = predictor.match_keywords(
+        fragment["words"], [w["word"] for w in heard_words], alignment.word_ops
+    )
+    # Word-level analysis on the timed words
+    missed_keywords, new_keywords, word_segments = predictor.word_analysis(
+        fragment["words"], heard_words, alignment.word_ops, keyword_matches
     )
-    sentences = original_text.split(". ")
-    readability_metrics = {
-        sentence: predictor.calculate_readability_metrics(sentence)
-        for sentence in sentences
-        if sentence
-    }
 
     response = {
         "transcription": transcription,
         "levenshtein_distance": lev_distance,
         "missed_keywords": missed_keywords,
         "new_keywords": new_keywords,
-        "word_complexities": word_complexities,
-        "readability_metrics": readability_metrics,
+        "keyword_matches": [match._asdict() for match in keyword_matches],
+        "word_segments": word_segments,
+        "word_complexities": fragment["word_complexities"],
+        "readability_metrics": fragment["readability_metrics"],
     }
     return response
 
@@ -62,44 +80,57 @@ def extract_missing_keywords_from_result(result):
 
 
 def remove_digits_and_specials(arr):
-    allowed_chars = set(string.ascii_letters)  #only english letters
-    cleaned = []
-    
-    for item in arr:
-        if len(item) <= 1:
-            continue
-        if all(char in allowed_chars for char in item):
-            cleaned.append(item)
-    
-    return cleaned
-
-def clean_and_convert_numbers(text: str) -> str:
-    # 1. Прибираємо спеціальні символи, залишаємо літери, цифри, пробіли
-    cleaned = re.sub(r'[^A-Za-z0-9\s]', '', text)
-    
-    # 2. Знаходимо числа в тексті
-    def replace_number(match):
-        num_str = match.group(0)
-        # Перетворюємо число в слова англійською
-        try:
-            num_word = num2words(int(num_str))
-            return num_word.replace('-', ' ')  # замінюємо дефіси на пробіли
-        except:
-            return num_str  # якщо не вдається конвертувати, повертаємо як є
-
-    # Заміна чисел на слова
-    converted = re.sub(r'\d+', replace_number, cleaned)
-
-    # 3. Прибираємо зайві пробіли
-    converted = re.sub(r'\s+', ' ', converted).strip()
-    
-    return converted
-
+    """
+    Keeps the words worth recording as mistakes. The missed keywords are already
+    AnalyzedText.normalized_words (lowercase letters and digits, numbers written out),
+    so this only drops single letters and words left with digits.
+    """
+    return [item for item in arr if len(item) > 1 and item.isascii() and item.isalpha()]
 
 def split_on_hyphen(s: str) -> list:
     parts = s.split('-')
     return parts
 
+def incorrect_segment_indices(word: str, segments: list[str], word_segments: list[dict], transcription: str) -> list[int]:
+    """
+    Returns the indices of the syllable segments that contain a mistake, judged from the
+    timed word_segments of the reading: a word Whisper heard with low confidence is wrong
+    in every syllable, one heard exactly is right, and for a misread word what was heard
+    in its place is aligned with it to find the syllables it differs in.
+    """
+    statuses = {segment["status"] for segment in word_segments}
+    if "low_confidence" in statuses:
+        return list(range(len(segments)))
+    if statuses == {"correct"}:
+        heard = "".join(segment.get("heard", segment["word"]) for segment in word_segments)
+    else:
+        heard = transcription
+    return misspelled_segment_indices(word, segments, heard)
+
+
+def misspelled_segment_indices(word: str, segments: list[str], heard: str) -> list[int]:
+    """
+    Aligns what was heard with the target word character by character and returns
+    the indices of the syllable segments that contain a mistake.
+    """
+    word = word.lower()
+    heard = heard.lower().replace(" ", "")
+    if "".join(segments).lower() != word:
+        # Syllables do not spell the word; only a whole-word judgement is possible.
+        return [] if heard == word else list(range(len(segments)))
+
+    owner = [i for i, segment in enumerate(segments) for _ in segment]
+    incorrect = set()
+    for op, word_start, word_end, _, _ in lev.opcodes(word, heard):
+        if op == "equal":
+            continue
+        if op == "insert":
+            incorrect.add(owner[min(word_start, len(owner) - 1)])
+        else:
+            incorrect.update(owner[word_start:word_end])
+    return sorted(incorrect)
+
+
 def generate_feedback(segments: list[str], incorrect_indices: list[int]) -> list[dict]:
     feedback = []
     for i, segment in enumerate(segments):
@@ -111,7 +142,6 @@ def generate_feedback(segments: list[str], incorrect_indices: list[int]) -> list
 def tts_to_base64(text, lang='en'):
     # Generate speech
     tts = gTTS(text, lang=lang)
-    tts.save(f'temp_audio.wav')
     # Save to memory buffer
     buffer = BytesIO()
     tts.write_to_fp(buffer)
@@ -119,4 +149,18 @@ def tts_to_base64(text, lang='en'):
 
     # Encode to base64
     audio_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    return audio_base64
\ No newline at end of file
+    return audio_base64
+
+
+def get_or_create_reference_pronunciation(word):
+    """
+    Returns the TTS reference audio and its transcription for the word.
+    Both only depend on the word, so they are generated once and then served from book.db.
+    """
+    reference = get_reference_pronunciation(word)
+    if reference is None:
+        audio_base64 = tts_to_base64(word)
+        transcription = clean_and_convert_numbers(predictor.process_base64_audio(audio_base64))
+        save_reference_pronunciation(word, audio_base64, transcription)
+        reference = {"word": word, "audio_base64": audio_base64, "transcription": transcription}
+    return reference
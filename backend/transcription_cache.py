@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from cache_store import LRUCache, SQLiteCacheTier
+
+TRANSCRIPTION_CACHE_SIZE = 256
+# Set to a path such as "db/transcriptions.db" to keep transcriptions across restarts.
+TRANSCRIPTION_CACHE_DB_PATH = None
+
+
+def transcription_cache_key(audio, model_name, options):
+    """
+    Hashes decoded 16 kHz float32 samples together with everything that changes Whisper's output.
+    """
+    digest = hashlib.sha256()
+    digest.update(audio.tobytes())
+    digest.update(model_name.encode("utf-8"))
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Caches Whisper results by audio content, and lets identical requests that are
+    already being decoded wait for that decode instead of starting their own.
+    """
+
+    def __init__(self, max_entries=TRANSCRIPTION_CACHE_SIZE, db_path=TRANSCRIPTION_CACHE_DB_PATH):
+        self._memory = LRUCache(max_entries)
+        self._disk = SQLiteCacheTier(db_path, "transcription_cache") if db_path else None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.in_flight_joins = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result for key, or calls compute() once and caches what it returns.
+        """
+        result = self._memory.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        if self._disk is not None:
+            result = self._disk.get(key)
+            if result is not None:
+                self.disk_hits += 1
+                self._memory.put(key, result)
+                return result
+
+        with self._lock:
+            # A leader stores its result before leaving _in_flight, so one that
+            # finished since the lookups above is found here.
+            result = self._memory.get(key)
+            if result is not None:
+                self.hits += 1
+                return result
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.in_flight_joins += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+            self._memory.put(key, result)
+            if self._disk is not None:
+                self._disk.put(key, result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses + self.in_flight_joins
+        return {
+            "entries": len(self._memory),
+            "max_entries": self._memory.max_entries,
+            "persistent": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "in_flight_joins": self.in_flight_joins,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+        }
+
+
+TRANSCRIPTION_CACHE = TranscriptionCache()
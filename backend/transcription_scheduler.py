@@ -0,0 +1,347 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE, TOKENS_PER_SECOND
+from whisper.model import disable_sdpa
+from whisper.timing import WordTiming, dtw, median_filter, merge_punctuations
+from whisper.tokenizer import get_tokenizer
+
+# Requests arriving within BATCH_WINDOW_MS of the first one share an encoder pass.
+# Each deployment can override the defaults through the environment.
+BATCH_MAX_SIZE = int(os.environ.get("WHISPER_BATCH_MAX_SIZE", 8))
+BATCH_WINDOW_MS = float(os.environ.get("WHISPER_BATCH_WINDOW_MS", 50))
+BATCH_QUEUE_DEPTH = int(os.environ.get("WHISPER_BATCH_QUEUE_DEPTH", 64))
+
+# Defaults of whisper.timing.add_word_timestamps.
+MEDFILT_WIDTH = 7
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+SENTENCE_END_MARKS = ".。!！?？"
+
+# Same quality gates transcribe() uses before retrying at a higher temperature.
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class TranscriptionQueueFullError(RuntimeError):
+    """Raised when more recordings are waiting than the scheduler's queue depth allows."""
+
+
+class _PendingTranscription:
+    def __init__(self, audio):
+        self.audio = audio
+        self.future = Future()
+
+
+class TranscriptionScheduler:
+    """
+    Collects concurrent transcription requests into micro-batches and decodes each
+    batch with a single Whisper encoder pass.
+    """
+
+    def __init__(
+        self,
+        loaded_model,
+        max_batch_size=BATCH_MAX_SIZE,
+        window_ms=BATCH_WINDOW_MS,
+        queue_depth=BATCH_QUEUE_DEPTH,
+    ):
+        self._loaded = loaded_model
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+
+    def submit(self, audio):
+        """
+        Queues a 16 kHz float32 recording and returns a Future resolving to Whisper's result dict.
+        """
+        self._ensure_started()
+        pending = _PendingTranscription(audio)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise TranscriptionQueueFullError(
+                f"Transcription queue is full ({self._queue.maxsize} recordings waiting)."
+            )
+        return pending.future
+
+    def transcribe(self, audio, timeout=None):
+        return self.submit(audio).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "model": self._loaded.key,
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window_seconds * 1000,
+            "queue_depth": self._queue.maxsize,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"whisper-batcher-{self._loaded.key}", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _process(self, batch):
+        # decode() only sees the first 30 s window, so longer recordings keep
+        # the sequential transcribe() path once the batch is answered.
+        short = [p for p in batch if len(p.audio) <= whisper.audio.N_SAMPLES]
+        long = [p for p in batch if len(p.audio) > whisper.audio.N_SAMPLES]
+        if short:
+            self._decode_batch(short)
+        for pending in long:
+            self._fallback(pending)
+
+    def _decode_batch(self, short):
+        model = self._loaded.model
+        mel = torch.stack(
+            [
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(p.audio), model.dims.n_mels)
+                for p in short
+            ]
+        ).to(model.device)
+        options = whisper.DecodingOptions(
+            language=None if model.is_multilingual else "en",
+            fp16=model.device.type != "cpu",
+        )
+        with self._loaded.lock:
+            results = whisper.decode(model, mel, options)
+        self.batches += 1
+        self.batched_requests += len(short)
+
+        decoded = []
+        for pending, result in zip(short, results):
+            if self._is_silence(result):
+                # transcribe() drops a window it considers silent.
+                pending.future.set_result({"text": "", "segments": [], "language": result.language})
+            elif self._needs_fallback(result):
+                self._fallback(pending)
+            else:
+                decoded.append((pending, result))
+        if decoded:
+            for (pending, _), timed in zip(decoded, self._with_word_timestamps(decoded)):
+                pending.future.set_result(timed)
+
+    def _with_word_timestamps(self, decoded):
+        """
+        Builds transcribe()-shaped results with per-word timings for (pending, result)
+        pairs of one batch.
+
+        whisper's add_word_timestamps runs the whole model, encoder included, once per
+        recording. Here the cross-attention alignment comes from a single decoder pass
+        over the audio features the batched decode already computed.
+        """
+        model = self._loaded.model
+        items = []
+        for pending, result in decoded:
+            tokenizer = get_tokenizer(
+                model.is_multilingual,
+                num_languages=model.num_languages,
+                language=result.language,
+                task="transcribe",
+            )
+            text_tokens = [token for token in result.tokens if token < tokenizer.eot]
+            sequence = [*tokenizer.sot_sequence, tokenizer.no_timestamps, *text_tokens, tokenizer.eot]
+            items.append((tokenizer, text_tokens, sequence))
+
+        # Padding after eot cannot change earlier positions of the causal decoder.
+        length = max(len(sequence) for _, _, sequence in items)
+        tokens = torch.tensor(
+            [sequence + [tokenizer.eot] * (length - len(sequence)) for tokenizer, _, sequence in items]
+        ).to(model.device)
+        audio_features = torch.stack([result.audio_features for _, result in decoded])
+
+        qks = [None] * model.dims.n_text_layer
+        hooks = [
+            block.cross_attn.register_forward_hook(
+                lambda _, ins, outs, index=i: qks.__setitem__(index, outs[-1])
+            )
+            for i, block in enumerate(model.decoder.blocks)
+        ]
+        try:
+            with self._loaded.lock, torch.no_grad(), disable_sdpa():
+                logits = model.decoder(tokens, audio_features)
+        finally:
+            for hook in hooks:
+                hook.remove()
+
+        timed = []
+        for i, ((pending, result), (tokenizer, text_tokens, sequence)) in enumerate(zip(decoded, items)):
+            num_frames = min(len(pending.audio) // HOP_LENGTH, N_FRAMES)
+            segment = {
+                "seek": 0,
+                "start": 0.0,
+                "end": num_frames * HOP_LENGTH / SAMPLE_RATE,
+                "text": result.text,
+                "tokens": result.tokens,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            }
+            weights = torch.stack(
+                [qks[layer][i, head, : len(sequence)] for layer, head in model.alignment_heads.indices().T]
+            )
+            alignment = _find_alignment(tokenizer, text_tokens, weights.float(), logits[i].float(), num_frames)
+            segment["words"] = _segment_words(segment, alignment)
+            timed.append({"text": result.text, "segments": [segment], "language": result.language})
+        return timed
+
+    def _is_silence(self, result):
+        return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+    def _needs_fallback(self, result):
+        return (
+            result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+            or result.avg_logprob < LOGPROB_THRESHOLD
+        )
+
+    def _fallback(self, pending):
+        self.fallbacks += 1
+        try:
+            pending.future.set_result(self._loaded.transcribe(pending.audio, word_timestamps=True))
+        except Exception as e:
+            pending.future.set_exception(e)
+
+
+def _find_alignment(tokenizer, text_tokens, weights, logits, num_frames):
+    """
+    whisper.timing.find_alignment, from the alignment heads' cross-attention weights
+    (heads x tokens x frames) and the logits of one already-run decoder pass.
+    """
+    if not text_tokens:
+        return []
+    sot_length = len(tokenizer.sot_sequence)
+    token_probs = logits[sot_length:, : tokenizer.eot].softmax(dim=-1)
+    text_token_probs = token_probs[np.arange(len(text_tokens)), text_tokens].tolist()
+
+    weights = weights[:, :, : num_frames // 2].softmax(dim=-1)
+    std, mean = torch.std_mean(weights, dim=-2, keepdim=True, unbiased=False)
+    weights = median_filter((weights - mean) / std, MEDFILT_WIDTH)
+    matrix = weights.mean(axis=0)[sot_length:-1]
+    text_indices, time_indices = dtw(-matrix)
+
+    words, word_tokens = tokenizer.split_to_word_tokens(text_tokens + [tokenizer.eot])
+    if len(word_tokens) <= 1:
+        return []
+    word_boundaries = np.pad(np.cumsum([len(t) for t in word_tokens[:-1]]), (1, 0))
+    jumps = np.pad(np.diff(text_indices), (1, 0), constant_values=1).astype(bool)
+    jump_times = time_indices[jumps] / TOKENS_PER_SECOND
+    start_times = jump_times[word_boundaries[:-1]]
+    end_times = jump_times[word_boundaries[1:]]
+    probabilities = [np.mean(text_token_probs[i:j]) for i, j in zip(word_boundaries[:-1], word_boundaries[1:])]
+    return [
+        WordTiming(word, tokens, start, end, probability)
+        for word, tokens, start, end, probability in zip(words, word_tokens, start_times, end_times, probabilities)
+    ]
+
+
+def _segment_words(segment, alignment):
+    """
+    The word list whisper.timing.add_word_timestamps builds for a lone segment at the
+    start of the recording; adjusts the segment's start and end the same way.
+    """
+    durations = np.array([t.end - t.start for t in alignment])
+    durations = durations[durations.nonzero()]
+    median_duration = min(0.7, float(np.median(durations))) if len(durations) > 0 else 0.0
+    max_duration = median_duration * 2
+    if len(durations) > 0:
+        for i in range(1, len(alignment)):
+            if alignment[i].end - alignment[i].start > max_duration:
+                if alignment[i].word in SENTENCE_END_MARKS:
+                    alignment[i].end = alignment[i].start + max_duration
+                elif alignment[i - 1].word in SENTENCE_END_MARKS:
+                    alignment[i].start = alignment[i].end - max_duration
+    merge_punctuations(alignment, PREPEND_PUNCTUATIONS, APPEND_PUNCTUATIONS)
+
+    words = [
+        dict(word=t.word, start=round(t.start, 2), end=round(t.end, 2), probability=t.probability)
+        for t in alignment
+        if t.word
+    ]
+    if not words:
+        return words
+    if words[0]["end"] > median_duration * 4 and (
+        words[0]["end"] - words[0]["start"] > max_duration
+        or (len(words) > 1 and words[1]["end"] - words[0]["start"] > max_duration * 2)
+    ):
+        if len(words) > 1 and words[1]["end"] - words[1]["start"] > max_duration:
+            boundary = max(words[1]["end"] / 2, words[1]["end"] - max_duration)
+            words[0]["end"] = words[1]["start"] = boundary
+        words[0]["start"] = max(0, words[0]["end"] - max_duration)
+    if segment["start"] < words[0]["end"] and segment["start"] - 0.5 > words[0]["start"]:
+        words[0]["start"] = max(0, min(words[0]["end"] - median_duration, segment["start"]))
+    else:
+        segment["start"] = words[0]["start"]
+    if segment["end"] > words[-1]["start"] and segment["end"] + 0.5 < words[-1]["end"]:
+        words[-1]["end"] = max(words[-1]["start"] + median_duration, segment["end"])
+    else:
+        segment["end"] = words[-1]["end"]
+    return words
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(loaded_model, **options):
+    """
+    Returns the process-wide scheduler for a shared model from WHISPER_REGISTRY.
+    options (max_batch_size, window_ms, queue_depth) override the module defaults
+    when the scheduler is created; asking again with different ones is an error.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(loaded_model.key)
+        if scheduler is None:
+            scheduler = TranscriptionScheduler(loaded_model, **options)
+            _schedulers[loaded_model.key] = scheduler
+        elif options:
+            current = {
+                "max_batch_size": scheduler.max_batch_size,
+                "window_ms": scheduler.window_seconds * 1000,
+                "queue_depth": scheduler._queue.maxsize,
+            }
+            if any(current[name] != value for name, value in options.items()):
+                raise ValueError(f"Scheduler for {loaded_model.key} already runs with {current}.")
+    return scheduler
+
+
+def scheduler_stats():
+    return [scheduler.stats() for scheduler in _schedulers.values()]
@@ -0,0 +1,144 @@
+import os
+import resource
+import threading
+import time
+import torch
+import whisper
+
+# Whisper checkpoints this process is allowed to load, and the one used by default.
+DEFAULT_WHISPER_MODEL = "base"
+WHISPER_MODEL_SIZES = ("base",)
+
+
+def _current_rss_bytes():
+    """
+    Returns the resident set size of this process in bytes.
+    Falls back to the peak RSS when /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _tensor_bytes(model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    state = model.state_dict()
+    # Dynamically quantized layers keep their int8 weights outside parameters().
+    packed = [
+        v for k, v in state.items()
+        if k.endswith("_packed_params") and isinstance(v, tuple)
+    ]
+    size = sum(t.numel() * t.element_size() for t in tensors)
+    for weight, bias in packed:
+        size += weight.numel() * weight.element_size()
+        if bias is not None:
+            size += bias.numel() * bias.element_size()
+    return size
+
+
+def quantize_int8(model):
+    """
+    Returns the model with every Linear layer dynamically quantized to int8 for CPU inference.
+    """
+    # whisper.model.Linear only overrides forward() to cast weights to the input
+    # dtype, a no-op in fp32; quantize_dynamic only swaps exact nn.Linear modules.
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class LoadedWhisperModel:
+    """
+    A Whisper model loaded once and shared by every request in the process.
+    """
+
+    def __init__(self, name, quantized, model, load_seconds, tensor_bytes, rss_delta_bytes):
+        self.name = name
+        self.quantized = quantized
+        self.key = f"{name}-int8" if quantized else name
+        self.model = model
+        self.load_seconds = load_seconds
+        self.tensor_bytes = tensor_bytes
+        self.rss_delta_bytes = rss_delta_bytes
+        # transcribe() installs kv-cache hooks on the shared module, so two
+        # decodes on the same model must never interleave.
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio, **options):
+        with self.lock:
+            return self.model.transcribe(audio, **options)
+
+    def stats(self):
+        return {
+            "model": self.key,
+            "load_seconds": round(self.load_seconds, 3),
+            "tensor_bytes": self.tensor_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+        }
+
+
+class WhisperModelRegistry:
+    """
+    Loads each configured Whisper checkpoint at most once per process.
+    """
+
+    def __init__(self, model_sizes=WHISPER_MODEL_SIZES, device=None):
+        self.model_sizes = tuple(model_sizes)
+        self.device = device
+        self._models = {}
+        self._load_locks = {name: threading.Lock() for name in self.model_sizes}
+
+    def get(self, name=DEFAULT_WHISPER_MODEL, quantized=False):
+        """
+        Returns the shared LoadedWhisperModel for the given size, loading it on first use.
+        With quantized=True the int8 CPU variant of the same checkpoint is returned.
+        """
+        if name not in self._load_locks:
+            raise ValueError(f"Whisper model {name} is not configured.")
+        loaded = self._models.get((name, quantized))
+        if loaded is not None:
+            return loaded
+        with self._load_locks[name]:
+            # Another request may have finished the load while we waited.
+            loaded = self._models.get((name, quantized))
+            if loaded is None:
+                loaded = self._load(name, quantized)
+                self._models[(name, quantized)] = loaded
+        return loaded
+
+    def _load(self, name, quantized):
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        if quantized:
+            model = quantize_int8(whisper.load_model(name, device="cpu"))
+        else:
+            model = whisper.load_model(name, device=self.device)
+        load_seconds = time.perf_counter() - start
+        rss_delta = max(_current_rss_bytes() - rss_before, 0)
+        tensor_bytes = _tensor_bytes(model)
+        print(
+            f"Loaded Whisper model {name}{' (int8)' if quantized else ''} in {load_seconds:.2f}s "
+            f"({tensor_bytes / 2**20:.1f} MiB of weights)"
+        )
+        return LoadedWhisperModel(name, quantized, model, load_seconds, tensor_bytes, rss_delta)
+
+    def warm_up(self, names=None, quantized=False):
+        """
+        Loads the given (by default all configured) models before the first request arrives.
+        """
+        for name in names or self.model_sizes:
+            self.get(name, quantized)
+
+    def stats(self):
+        return {
+            "configured": list(self.model_sizes),
+            "loaded": [loaded.stats() for loaded in self._models.values()],
+            "process_rss_bytes": _current_rss_bytes(),
+        }
+
+
+WHISPER_REGISTRY = WhisperModelRegistry()
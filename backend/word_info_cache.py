@@ -0,0 +1,226 @@
+"""
+Generated word information shared by all forms of a word.
+
+The meaning, antonyms, synonyms and examples of a word are generated once per lemma
+and kept in the word_info_cache table of book.db, keyed by the lemma and the prompt
+version they were generated with. "jumped" and "jumping" reuse what was generated for
+"jump", and only their form-specific fields (IPA, syllables) are asked for. A form
+seen before its lemma is asked for in the lemma's own prompt, so it still costs one call.
+
+The prompt version each existing_words row was filled with is kept in
+word_info_versions. After a prompt change (a new WORD_INFO_PROMPT_VERSION in
+db/gpt_api.py), a known word is requeued when a child misses it again, or in bounded
+batches with (from the backend directory):
+    python word_info_cache.py refresh [--limit 200]
+    python word_info_cache.py status
+"""
+import argparse
+import json
+import threading
+import time
+from nltk.corpus import wordnet
+from db.connection import BOOK_DB
+from db.gpt_api import WORD_FORM_FIELDS, WORD_INFO_FIELDS
+from preprocessor import LEMMATIZER
+
+# Fields generated once per lemma.
+SHARED_WORD_INFO_FIELDS = tuple(field for field in WORD_INFO_FIELDS if field not in WORD_FORM_FIELDS)
+# Readings a word is lemmatized under. Adjectives are left out: "better" -> "good"
+# does not share a meaning.
+LEMMA_POS = ("v", "n")
+# Shorter words are their own lemma; WordNet maps e.g. "was" to "wa" as a noun.
+MIN_LEMMATIZED_LENGTH = 4
+# Words requeued per `refresh` run.
+WORD_INFO_REFRESH_LIMIT = 200
+
+
+def word_lemma(word):
+    """
+    The lemma whose generated information the word shares, using the WordNet
+    lemmatizer of the complexity features. Without the sentence the part of speech is
+    unknown, so a word is its own lemma when WordNet has it as a base form of its own
+    ("ground", "left", "building", not "grind", "leave", "build") or when its readings
+    disagree ("leaves": "leave" or "leaf").
+    """
+    if len(word) < MIN_LEMMATIZED_LENGTH or wordnet.lemmas(word):
+        return word
+    lemmas = {LEMMATIZER.lemmatize(word, pos) for pos in LEMMA_POS} - {word}
+    return lemmas.pop() if len(lemmas) == 1 else word
+
+
+class WordInfoCache:
+    """
+    Lemma-level word information in SQLite, for one prompt version at a time.
+    """
+
+    def __init__(self, db=BOOK_DB):
+        self.db = db
+        self._stats_lock = threading.Lock()
+        self.lemma_hits = 0
+        self.lemma_misses = 0
+        self.form_only_words = 0
+        self.forms_with_lemma = 0
+
+    def get_many(self, lemmas, prompt_version):
+        """
+        Returns {lemma: info} for the lemmas cached under prompt_version.
+        """
+        lemmas = list(dict.fromkeys(lemmas))
+        infos = {}
+        for i in range(0, len(lemmas), 500):
+            chunk = lemmas[i:i + 500]
+            rows = self.db.fetchall(
+                f"SELECT lemma, info FROM word_info_cache WHERE prompt_version = ? "
+                f"AND lemma IN ({', '.join('?' * len(chunk))})",
+                [prompt_version, *chunk],
+            )
+            infos.update((row[0], json.loads(row[1])) for row in rows)
+        return infos
+
+    def put_many(self, infos, prompt_version):
+        """
+        Stores {lemma: info} under prompt_version, replacing other versions of the lemmas.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM word_info_cache WHERE lemma = ? AND prompt_version != ?",
+                [(lemma, prompt_version) for lemma in infos],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO word_info_cache (lemma, prompt_version, info, created_at) VALUES (?, ?, ?, ?)",
+                [(lemma, prompt_version, json.dumps(info), now) for lemma, info in infos.items()],
+            )
+
+    def record_stored(self, words, prompt_version):
+        """
+        Notes that the existing_words rows of these words now hold answers of prompt_version.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO word_info_versions (word, prompt_version, stored_at) VALUES (?, ?, ?)",
+                [(word, prompt_version, now) for word in words],
+            )
+
+    def stale(self, words, prompt_version):
+        """
+        The words whose existing_words row was not filled with prompt_version, including
+        rows filled before versions were recorded.
+        """
+        words = list(dict.fromkeys(words))
+        current = set()
+        for i in range(0, len(words), 500):
+            chunk = words[i:i + 500]
+            rows = self.db.fetchall(
+                f"SELECT word FROM word_info_versions WHERE prompt_version = ? "
+                f"AND word IN ({', '.join('?' * len(chunk))})",
+                [prompt_version, *chunk],
+            )
+            current.update(row[0] for row in rows)
+        return [word for word in words if word not in current]
+
+    def word_info_many(self, words, provider):
+        """
+        Returns ({word: info}, {word: exception}) like provider.word_info_many, asking
+        the provider for the full information of uncached lemmas only and for the
+        form-specific fields of the other inflected forms.
+        """
+        version = provider.prompt_version
+        lemmas = {word: word_lemma(word) for word in dict.fromkeys(words)}
+        cached = self.get_many(lemmas.values(), version)
+        missing = [lemma for lemma in dict.fromkeys(lemmas.values()) if lemma not in cached]
+        # Forms of an uncached lemma go in the lemma's prompt instead of a second call
+        with_lemma = [word for word, lemma in lemmas.items() if word != lemma and lemma not in cached]
+        generated, failed = provider.word_info_many(missing + with_lemma) if missing else ({}, {})
+        new_lemmas = {lemma: generated[lemma] for lemma in missing if lemma in generated}
+        if new_lemmas:
+            self.put_many(new_lemmas, version)
+            cached.update(new_lemmas)
+
+        # The lemma's own entry already holds its form fields
+        forms_needed = [
+            word for word, lemma in lemmas.items() if word != lemma and lemma in cached and word not in generated
+        ]
+        forms, form_errors = provider.word_forms_many(forms_needed) if forms_needed else ({}, {})
+        forms.update((word, generated[word]) for word in with_lemma if word in generated)
+
+        infos, errors = {}, {}
+        for word, lemma in lemmas.items():
+            if lemma in failed:
+                errors[word] = failed[lemma]
+            elif lemma not in cached:
+                errors[word] = RuntimeError(f"Provider returned nothing for '{lemma}'.")
+            elif word == lemma:
+                infos[word] = cached[lemma]
+            elif word in forms:
+                shared = {field: cached[lemma][field] for field in SHARED_WORD_INFO_FIELDS}
+                infos[word] = {**shared, **{field: forms[word][field] for field in WORD_FORM_FIELDS}}
+            else:
+                errors[word] = form_errors.get(word, RuntimeError(f"Provider returned no forms for '{word}'."))
+
+        with self._stats_lock:
+            self.lemma_hits += len(set(lemmas.values())) - len(missing)
+            self.lemma_misses += len(missing)
+            self.form_only_words += len(forms_needed)
+            self.forms_with_lemma += len(with_lemma)
+        return infos, errors
+
+    def stats(self):
+        rows = self.db.fetchall("SELECT prompt_version, COUNT(*) FROM word_info_cache GROUP BY prompt_version")
+        return {
+            "lemmas": {row[0]: row[1] for row in rows},
+            "lemma_hits": self.lemma_hits,
+            "lemma_misses": self.lemma_misses,
+            "form_only_words": self.form_only_words,
+            "forms_with_lemma": self.forms_with_lemma,
+        }
+
+
+WORD_INFO_CACHE = WordInfoCache()
+
+
+def stale_words(cache, prompt_version, limit=WORD_INFO_REFRESH_LIMIT):
+    """
+    Returns up to `limit` words of existing_words that were not filled with
+    prompt_version, keeping the forms of a lemma together.
+    """
+    rows = cache.db.fetchall(
+        "SELECT e.word FROM existing_words e LEFT JOIN word_info_versions v ON v.word = e.word "
+        "WHERE e.meaning IS NOT NULL AND (v.prompt_version IS NULL OR v.prompt_version != ?) ORDER BY e.id",
+        (prompt_version,),
+    )
+    by_lemma = {}
+    for row in rows:
+        by_lemma.setdefault(word_lemma(row[0]), []).append(row[0])
+    words = []
+    for forms in by_lemma.values():
+        if words and len(words) + len(forms) > limit:
+            break
+        words.extend(forms)
+    return words
+
+
+def main():
+    from enrichment_queue import ENRICHMENT_QUEUE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="Queue words filled with an older prompt.")
+    refresh.add_argument("--limit", type=int, default=WORD_INFO_REFRESH_LIMIT)
+    commands.add_parser("status", help="Show the cached lemmas per prompt version.")
+    args = parser.parse_args()
+
+    version = ENRICHMENT_QUEUE.provider.prompt_version
+    if args.command == "refresh":
+        words = stale_words(WORD_INFO_CACHE, version, args.limit)
+        ENRICHMENT_QUEUE.enqueue(words, start=False)
+        print(f"Queued {len(words)} words for prompt version {version}; the server's workers pick them up.")
+    else:
+        print(f"Current prompt version: {version}")
+        for prompt_version, count in WORD_INFO_CACHE.stats()["lemmas"].items():
+            print(f"{prompt_version}: {count} lemmas")
+
+
+if __name__ == "__main__":
+    main()